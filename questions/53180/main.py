@@ -1,8 +1,10 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-import geopandas as gpd
-from collections import Counter
-import us
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common import basemap, geo, labels, render, splits
 
 # Read in president result data adapted from source below
 # Source: https://en.wikipedia.org/wiki/List_of_United_States_presidential_election_results_by_state
@@ -13,16 +15,10 @@ pres_df = pd.read_csv("presidential_results.csv").set_index("State")
 house_df = pd.read_csv("house_results.csv").set_index("State")
 
 
-# Get dictionary mapping presidential election year to states voting
-# differently to previous election
-diff_states = {}
-
-for y in range(1864, 2024, 4):
-    pres = pres_df[str(y)].to_dict()
-    house = house_df[str(y - 2)].to_dict()
-    diff_states[y] = [
-        k for k in pres if pres[k] != house[k] and not pd.isnull(house[k])
-    ]
+# States x years grid of whether the presidential vote went differently to
+# the previous House election
+split = splits.split_matrix(pres_df, house_df, range(1864, 2024, 4))
+diff_states = splits.by_year(split)
 
 # Output with nicer formatting
 with open("output.txt", "w") as f:
@@ -30,23 +26,12 @@ with open("output.txt", "w") as f:
         f.write(f'{y} - {", ".join(sorted(diff_states[y]))}\n')
 
 # Get per-state vote count
-state_counts = Counter(y for x in diff_states.values() for y in x)
-
-# Convert to df and plot
-df = pd.DataFrame(state_counts.items(), columns=["State", "n"])
+df = splits.counts(split).rename("n").rename_axis("State").reset_index()
 
 # Shapefile not included in repo
 # Source: https://www.census.gov/geographies/mapping-files/time-series/geo/carto-boundary-file.html
-map_df = gpd.read_file("cb_2018_us_state_500k.shp").to_crs(epsg=2163)
-
-# Reposition Alaska & Hawaii
-m = map_df["NAME"] == "Alaska"
-map_df[m] = map_df[m].set_geometry(
-    map_df[m].scale(0.6, 0.6, 0.6).translate(1700000, -5000000)
-)
-
-m = map_df["NAME"] == "Hawaii"
-map_df[m] = map_df[m].set_geometry(map_df[m].translate(6000000, -1800000))
+# Projected, with Alaska & Hawaii repositioned
+map_df = basemap.us_states(pixels=render.pixels(800))
 
 # Merge & plot
 map_df["State"] = map_df["NAME"]
@@ -64,13 +49,11 @@ merged.plot(
 )
 ax.axis("off")
 ax.set_title("Number of times a State has voted differently", fontsize=12)
-merged.apply(
-    lambda x: ax.annotate(
-        text=f"{us.states.lookup(x['State']).abbr}\n{x['n']}",
-        xy=x.geometry.centroid.coords[0],
-        ha="center",
-        fontsize=3,
-    ),
-    axis=1,
+labels.draw(
+    ax,
+    labels.anchors(merged),
+    [f"{s}\n{n}" for s, n in zip(geo.lookup(merged["State"]), merged["n"])],
+    fontsize=3,
+    priority=merged.area,
 )
-plt.savefig("state_map.png", bbox_inches="tight", pad_inches=0, dpi=800)
+render.savefig("state_map.png", bbox_inches="tight", pad_inches=0, dpi=800)
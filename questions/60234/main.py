@@ -1,119 +1,223 @@
+import argparse
+import time
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-import matplotlib.patheffects as pe
 import geopandas as gpd
-import urllib.request, json
-
-# Read presidential results from Daily Kos source
-pres_df = pd.read_html(
-    "https://docs.google.com/spreadsheets/d/1XbUXnI9OyfAuhP5P3vWtMuGc5UJlrhXbzZo3AwMuHtk/htmlview#gid=0"
-)[0]
-
-# Reformat dataframe
-pres_df.columns = pres_df.iloc[1]
-pres_df = pres_df[3:].iloc[:, [1, 4, 5]]
-
-# Make CD column consistent
-pres_df["CD"] = pres_df["CD"].apply(lambda x: x.replace("-AL", "-01"))
-
-pres_df["Biden"] = pres_df["Biden"].astype(float)
-pres_df["Trump"] = pres_df["Trump"].astype(float)
-
-# Create winner column
-pres_df["pres_winner"] = pres_df.apply(
-    lambda x: "democrat"
-    if x["Biden"] > x["Trump"]
-    else "republican"
-    if x["Biden"] < x["Trump"]
-    else "uncalled",
-    axis=1,
-)
-
-print(len(pres_df[~pd.isnull(pres_df['Biden'])].reset_index(drop=True)))
-
-# Read house results from NYT source
-with urllib.request.urlopen(
-    "https://static01.nyt.com/elections-assets/2020/data/api/2020-11-03/national-map-page/national/house.json"
-) as url:
-    data = json.load(url)["data"]["races"]
-
-# Set up house results dataframe
-house_df = pd.DataFrame(
-    {
-        "CD": [f"{race['state_id']}-{str(race['seat']).zfill(2)}" for race in data],
-        "house_winner": [race["leader_party_id"] for race in data],
-    }
-)
-
-# Merge the two dataframes and create map colour column accordingly
-merged = pres_df.merge(house_df, on="CD")
-
-merged["colour"] = merged.apply(
-    lambda x: "b"
-    if x["pres_winner"] == x["house_winner"] == "democrat"
-    else "r"
-    if x["pres_winner"] == x["house_winner"] == "republican"
-    else "c"
-    if x["pres_winner"] == "republican" and x["house_winner"] == "democrat"
-    else "m"
-    if x["pres_winner"] == "democrat" and x["house_winner"] == "republican"
-    else "gray",
-    axis=1,
-)
-
-merged.to_csv("results.csv", index=False)
-
-# Shapefile not included in repo - source: dkel.ec/map
-map_df = gpd.read_file("HexCDv21/HexCDv21.shp")
-map_df = map_df[map_df.geometry.notnull()]
-
-map_df["CDFIPS"] = map_df["GEOID"].apply(lambda x: "01" if x[2:] == "00" else x[2:])
-map_df["CD"] = map_df.apply(lambda x: f"{x['STATEAB']}-{x['CDFIPS']}", axis=1)
-
-# Hexmap geometry is a bit weird, so stretch the map a little on the x axis.
-map_df['geometry'] = map_df['geometry'].scale(xfact=1.4, origin=(0,0))
-
-map_merged = map_df.merge(merged, on="CD")
-
-# Map plotting
-fig, ax = plt.subplots(1)
-map_merged.plot(facecolor=map_merged["colour"], edgecolor="0.6", ax=ax, linewidth=0.5)
-
-ax.axis("off")
-ax.set_title("2020 Presidential Winner & House Party by CD")
-ax.legend(
-    handles=[
-        mpatches.Patch(
-            color="r",
-            label=f'Trump-Republican ({merged["colour"].value_counts().get("r",0)})',
-        ),
-        mpatches.Patch(
-            color="b",
-            label=f'Biden-Democrat ({merged["colour"].value_counts().get("b",0)})',
-        ),
-        mpatches.Patch(
-            color="c",
-            label=f'Trump-Democrat ({merged["colour"].value_counts().get("c",0)})',
-        ),
-        mpatches.Patch(
-            color="m",
-            label=f'Biden-Republican ({merged["colour"].value_counts().get("m",0)})',
-        ),
-        mpatches.Patch(
-            color="gray",
-            label=f'Not Yet Available ({merged["colour"].value_counts().get("gray",0)})',
-        ),
-    ],
-    loc="upper left",
-    prop={"size": 4.5},
-)
-
-map_merged.apply(
-    lambda x: ax.text(
-        x.geometry.centroid.coords[0][0], x.geometry.centroid.coords[0][1], x["CDLABEL"], ha="center", fontsize=2.5, color='w', path_effects=[pe.withStroke(linewidth=0.2, foreground="black")]
-    ),
-    axis=1,
-)
-
-plt.savefig("map.png", bbox_inches="tight", pad_inches=0, dpi=600)
+import shapely
+import sys
+from pathlib import Path
+from matplotlib.colors import to_rgba_array
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.fetch import fetch
+from common.pipeline import Pipeline
+from common import geo, labels, live, nyt, render
+
+# Presidential results by CD from Daily Kos source
+PRES_URL = "https://docs.google.com/spreadsheets/d/1XbUXnI9OyfAuhP5P3vWtMuGc5UJlrhXbzZo3AwMuHtk/htmlview#gid=0"
+
+LEGEND = {
+    "r": "Trump-Republican",
+    "b": "Biden-Democrat",
+    "c": "Trump-Democrat",
+    "m": "Biden-Republican",
+    "gray": "Not Yet Available",
+}
+
+# Resolution of the frames written while watching; the full 600 dpi map.png is
+# written on exit
+LIVE_DPI = 100
+
+pipeline = Pipeline(__file__)
+
+
+def read_pres(path):
+    pres_df = pd.read_html(path)[0]
+
+    # Reformat dataframe
+    pres_df.columns = pres_df.iloc[1]
+    pres_df = pres_df[3:].iloc[:, [1, 4, 5]]
+
+    # Make CD column consistent
+    pres_df["CD"] = pres_df["CD"].str.replace("-AL", "-01")
+    pres_df["cd"] = geo.parse_cds(pres_df["CD"])
+
+    pres_df["Biden"] = pres_df["Biden"].astype(float)
+    pres_df["Trump"] = pres_df["Trump"].astype(float)
+
+    # Create winner column
+    pres_df["pres_winner"] = np.select(
+        [pres_df["Biden"] > pres_df["Trump"], pres_df["Biden"] < pres_df["Trump"]],
+        ["democrat", "republican"],
+        "uncalled",
+    )
+
+    print(len(pres_df[~pd.isnull(pres_df['Biden'])].reset_index(drop=True)))
+    return pres_df
+
+
+def results(pres_path, house_url):
+    # Read house results from NYT source
+    house = nyt.load(house_url)
+
+    # Set up house results dataframe, keyed on the district code
+    house_df = pd.DataFrame(
+        {"cd": house.races["cd"], "house_winner": house.races["leader_party_id"]}
+    )
+
+    # Merge the two dataframes and create map colour column accordingly
+    merged = read_pres(pres_path).merge(house_df, on="cd").drop(columns="cd")
+
+    pres, house = merged["pres_winner"], merged["house_winner"]
+    merged["colour"] = np.select(
+        [
+            (pres == "democrat") & (house == "democrat"),
+            (pres == "republican") & (house == "republican"),
+            (pres == "republican") & (house == "democrat"),
+            (pres == "democrat") & (house == "republican"),
+        ],
+        ["b", "r", "c", "m"],
+        "gray",
+    )
+    return merged
+
+
+@pipeline.stage(outputs=["results.csv"], sources=[PRES_URL, nyt.HOUSE])
+def merge():
+    results(fetch(PRES_URL), nyt.HOUSE).to_csv("results.csv", index=False)
+
+
+def legend_labels(colours):
+    counts = colours.value_counts()
+    return [f"{label} ({counts.get(c, 0)})" for c, label in LEGEND.items()]
+
+
+def draw(merged):
+    # Shapefile not included in repo - source: dkel.ec/map
+    map_df = gpd.read_file("HexCDv21/HexCDv21.shp")
+    map_df = map_df[map_df.geometry.notnull()]
+
+    map_df["CDFIPS"] = map_df["GEOID"].apply(lambda x: "01" if x[2:] == "00" else x[2:])
+    map_df["CD"] = map_df.apply(lambda x: f"{x['STATEAB']}-{x['CDFIPS']}", axis=1)
+
+    # Hexmap geometry is a bit weird, so stretch the map a little on the x axis.
+    map_df['geometry'] = map_df['geometry'].scale(xfact=1.4, origin=(0,0))
+
+    # Keep CDs without results yet, in gray, so they can be coloured in later
+    map_merged = map_df.merge(merged, on="CD", how="left")
+    map_merged["colour"] = map_merged["colour"].fillna("gray")
+
+    # Map plotting
+    fig, ax = plt.subplots(1)
+    map_merged.plot(facecolor=map_merged["colour"], edgecolor="0.6", ax=ax, linewidth=0.5)
+
+    ax.axis("off")
+    ax.set_title("2020 Presidential Winner & House Party by CD")
+    ax.legend(
+        handles=[
+            mpatches.Patch(color=c, label=label)
+            for c, label in zip(LEGEND, legend_labels(map_merged["colour"]))
+        ],
+        loc="upper left",
+        prop={"size": 4.5},
+    )
+
+    labels.draw(
+        ax,
+        labels.anchors(map_merged),
+        map_merged["CDLABEL"],
+        fontsize=2.5,
+        color="w",
+        stroke=0.2,
+    )
+    return fig, ax, map_merged
+
+
+@pipeline.stage(inputs=["results.csv", "HexCDv21/HexCDv21.shp"], outputs=["map.png"])
+def plot():
+    draw(pd.read_csv("results.csv"))
+    render.savefig("map.png", bbox_inches="tight", pad_inches=0, dpi=600)
+
+
+class LiveMap:
+    """The map figure, recoloured in place as results change."""
+
+    def __init__(self, merged):
+        self.fig, self.ax, map_merged = draw(merged)
+        # The collection has one path per polygon, so a multipolygon CD
+        # covers several
+        parts = shapely.get_num_geometries(map_merged.geometry.values)
+        self.path_cds = np.repeat(map_merged["CD"].to_numpy(), parts)
+        self.patches = self.ax.collections[0]
+        self.colour = map_merged.set_index("CD")["colour"]
+
+    def update(self, merged):
+        """Recolour the CDs whose colour changed, and return how many did."""
+        colour = merged.set_index("CD")["colour"].reindex(self.colour.index)
+        colour = colour.fillna("gray")
+        changed = colour.index[colour != self.colour]
+        if len(changed):
+            facecolors = self.patches.get_facecolor()
+            recolour = np.isin(self.path_cds, changed)
+            facecolors[recolour] = to_rgba_array(colour[self.path_cds[recolour]])
+            self.patches.set_facecolor(facecolors)
+            texts = self.ax.get_legend().get_texts()
+            for text, label in zip(texts, legend_labels(colour)):
+                text.set_text(label)
+            self.colour = colour
+        return len(changed)
+
+
+def watch(interval, feeds=None):
+    """
+    Redraw the map whenever either feed changes, recolouring just the CDs
+    whose colour changed, and write it to map.live.png at LIVE_DPI. The
+    full-resolution map.png is written when watching stops (Ctrl-C).
+
+    With feeds (e.g. http://localhost:8000/, see common/live.py) the feeds are
+    read from there rather than from Daily Kos and the NYT.
+    """
+    urls = [PRES_URL, nyt.HOUSE]
+    if feeds:
+        urls = [feeds.rstrip("/") + "/" + live.name_for(url) for url in urls]
+
+    plt.ion()
+    live_map = None
+    try:
+        for pres_path, _ in live.poll(urls, interval):
+            start = time.perf_counter()
+            merged = results(pres_path, urls[1])
+            if live_map is None:
+                live_map = LiveMap(merged)
+                changed = len(live_map.colour)
+            else:
+                changed = live_map.update(merged)
+            if changed:
+                live_map.fig.canvas.draw_idle()
+                render.savefig(
+                    "map.live.png", bbox_inches="tight", pad_inches=0, dpi=LIVE_DPI
+                )
+            print(
+                f"{time.strftime('%H:%M:%S')} {changed} CDs changed, "
+                f"refreshed in {time.perf_counter() - start:.2f}s"
+            )
+            plt.pause(0.01)
+    except KeyboardInterrupt:
+        if live_map is not None:
+            start = time.perf_counter()
+            render.savefig("map.png", bbox_inches="tight", pad_inches=0, dpi=600)
+            print(f"wrote map.png in {time.perf_counter() - start:.2f}s")
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--watch", action="store_true", help="redraw as results come in")
+parser.add_argument("--interval", type=float, default=30, help="seconds between polls")
+parser.add_argument("--feeds", help="base URL to poll instead, e.g. a stub server")
+args = parser.parse_known_args()[0]
+
+if args.watch:
+    watch(args.interval, args.feeds)
+else:
+    pipeline.run()
@@ -1,105 +1,88 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.interpolate import interp1d
-import statsmodels.api as sm
+import sys
+from pathlib import Path
 
-plt.style.use("ggplot")
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.fox import COUNTY_FEED, load_counties
+from common.pipeline import Pipeline
+from common import countypres, geo, render, resample, smooth, stats
 
-# Read 2020 results from Fox source
-df_2020 = pd.read_csv(
-    "https://feeds-elections.foxnews.com/archive/politics/elections/2020/3/President/county-level-results/feed_slimmer.csv"
+pipeline = Pipeline(__file__)
+
+
+@pipeline.stage(
+    outputs=[pipeline.path("pres.csv")],
+    sources=[countypres.SOURCE, COUNTY_FEED],
 )
+def pres():
+    # 2016 results from Harvard source, 2020 from Fox source
+    votes = countypres.matrix({2020: load_counties()})
+    df_pres = votes.swing(2016, 2020).rename("2-party change").dropna().reset_index()
+    df_pres[["FIPS", "2-party change"]].to_csv(pipeline.path("pres.csv"), index=False)
 
-# Extract useful columns
-df_2020 = df_2020[[df_2020.columns[i] for i in [0, 2, 3, 5]]]
-df_2020.columns = ["FIPS", "Switch", "Candidate 1", "Candidate 2"]
 
-# Format dataframe in terms of Trump/Biden
-df_2020["republican"] = df_2020.apply(
-    lambda x: x["Candidate 1"] if x["Switch"] else x["Candidate 2"], axis=1
-).astype(int)
-df_2020["democrat"] = df_2020.apply(
-    lambda x: x["Candidate 2"] if x["Switch"] else x["Candidate 1"], axis=1
-).astype(int)
+@pipeline.stage(
+    inputs=[pipeline.path("pres.csv"), "degree_data.csv"], outputs=["out_data.csv"]
+)
+def merge():
+    df_pres = pd.read_csv(pipeline.path("pres.csv"), dtype={"FIPS": str})
 
-df_2020["FIPS"] = df_2020["FIPS"].apply(lambda x: str(x).zfill(5))
+    # Read in county data from ACS source (reformatted from original)
+    df_degree = pd.read_csv("degree_data.csv")
+    df_degree["FIPS"] = geo.fips(df_degree["id"].str.rsplit("US", n=1).str[-1])
+    df_degree["Degree_percent"] = df_degree["Degree_percent"] * 100
+    df_degree = df_degree[["FIPS", "Degree_percent"]]
 
-df_2020 = df_2020[["FIPS", "republican", "democrat"]]
+    final_df = df_degree.merge(df_pres, on="FIPS")
+    final_df.to_csv("out_data.csv", index=False)
 
 
-# Read 2016 results from Harvard source
-df_2016 = pd.read_csv(
-    "https://dataverse.harvard.edu/api/access/datafile/3641280?format=original&gbrecs=true"
-)
-df_2016 = df_2016[
-    (df_2016["year"] == 2016)
-    & (df_2016["party"].isin(["republican", "democrat"]))
-    & (~df_2016["FIPS"].isnull())
-]
-df_2016 = df_2016.pivot(
-    index="FIPS", columns="party", values="candidatevotes"
-).reset_index()
-df_2016["FIPS"] = df_2016["FIPS"].astype(float).apply(lambda x: str(int(x)).zfill(5))
-
-df_pres = df_2016.merge(df_2020, on="FIPS")
-df_pres["2-party change"] = df_pres.apply(
-    lambda x: (x["democrat_y"] / (x["republican_y"] + x["democrat_y"])) * 100
-    - (x["democrat_x"] / (x["republican_x"] + x["democrat_x"])) * 100,
-    axis=1,
-)
-df_pres = df_pres[["FIPS", "2-party change"]]
-
-# Read in county data from ACS source (reformatted from original)
-df_degree = pd.read_csv("degree_data.csv")
-df_degree["FIPS"] = df_degree["id"].apply(lambda x: str(x).split("US")[-1])
-df_degree["Degree_percent"] = df_degree["Degree_percent"] * 100
-df_degree = df_degree[["FIPS", "Degree_percent"]]
-
-final_df = df_degree.merge(df_pres, on="FIPS")
-final_df.to_csv("out_data.csv", index=False)
-
-fig, ax = plt.subplots()
-final_df.plot(x="Degree_percent", y="2-party change", s=0.5, kind="scatter", ax=ax)
-ax.set_xlabel("Population with Bachelor's degree or higher (%)")
-ax.set_ylabel("2016/20 2-party margin change (pp)")
-
-x = final_df["Degree_percent"]
-y = final_df["2-party change"]
-
-# Plot LOWESS curve
-lowess = sm.nonparametric.lowess(y, x, frac=0.3)
-lowess_x = list(zip(*lowess))[0]
-lowess_y = list(zip(*lowess))[1]
-f = interp1d(lowess_x, lowess_y, bounds_error=False)
-xnew = np.arange(min(x), max(x), 0.05)
-ynew = f(xnew)
-ax.plot(xnew, ynew, "m--", alpha=0.5)
-
-# Plot linear trend-line
-while True:
-    try:
-        z = np.polyfit(final_df["Degree_percent"], final_df["2-party change"], 1)
-        break
-    except:
-        continue
-p = np.poly1d(z)
-
-ax.plot(
-    np.unique(final_df["Degree_percent"]),
-    p(np.unique(final_df["Degree_percent"])),
-    "r--",
-    alpha=0.5,
-)
+@pipeline.stage(inputs=["out_data.csv"], outputs=["graph.png"])
+def plot():
+    final_df = pd.read_csv("out_data.csv", dtype={"FIPS": str})
 
-cc = round(final_df.corr()["Degree_percent"]["2-party change"], 2)
-beta = round(z[0], 2)
+    plt.style.use("ggplot")
+
+    fig, ax = plt.subplots()
+    final_df.plot(x="Degree_percent", y="2-party change", s=0.5, kind="scatter", ax=ax)
+    ax.set_xlabel("Population with Bachelor's degree or higher (%)")
+    ax.set_ylabel("2016/20 2-party margin change (pp)")
+
+    x = final_df["Degree_percent"]
+    y = final_df["2-party change"]
+
+    # Plot LOWESS curve
+    xnew = np.arange(min(x), max(x), 0.05)
+    ynew = smooth.lowess(x, y, xnew, frac=0.3)
+    ax.plot(xnew, ynew, "m--", alpha=0.5)
+
+    # Plot linear trend-line
+    fit = stats.linregress(final_df["Degree_percent"], final_df["2-party change"])
+    p = np.poly1d([fit.slope, fit.intercept])
+
+    ax.plot(
+        np.unique(final_df["Degree_percent"]),
+        p(np.unique(final_df["Degree_percent"])),
+        "r--",
+        alpha=0.5,
+    )
+
+    cc = round(fit.r, 2)
+    beta = round(fit.slope, 2)
+    ci = resample.bootstrap(x, y)
+
+    ax.annotate(
+        f"Pearson's Correlation Coefficient: {cc} [{ci.r.low:.2f}, {ci.r.high:.2f}]\n"
+        f" Trend line gradient: {beta} [{ci.slope.low:.2f}, {ci.slope.high:.2f}]\n"
+        " (95% bootstrap intervals)",
+        xy=(20, -27.5),
+        xycoords="data",
+        bbox=dict(boxstyle="round", fc="0.8"),
+    )
+
+    render.savefig("graph.png", bbox_inches="tight", pad_inches=0, dpi=800)
 
-ax.annotate(
-    f"Pearson's Correlation Coefficient: {cc}\n Trend line gradient: {beta}",
-    xy=(20, -27.5),
-    xycoords="data",
-    bbox=dict(boxstyle="round", fc="0.8"),
-)
 
-plt.savefig("graph.png", bbox_inches="tight", pad_inches=0, dpi=800)
+pipeline.run()
@@ -1,22 +1,21 @@
 import pandas as pd
-import urllib.request, json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common import geo, nyt
 
 pres_df = pd.read_csv('pres-by-cd.csv')
+pres_df["cd"] = geo.parse_cds(pres_df["CD"])
 
-with urllib.request.urlopen(
-    "https://static01.nyt.com/elections-assets/2020/data/api/2020-11-03/national-map-page/national/house.json"
-) as url:
-    data = json.load(url)["data"]["races"]
+house = nyt.load(nyt.HOUSE)
 
 # Set up house results dataframe
 house_df = pd.DataFrame(
-    {
-        "CD": [f"{race['state_id']}-{str(race['seat']).zfill(2)}" for race in data],
-        "house_winner": [race["leader_party_id"] for race in data],
-    }
+    {"cd": house.races["cd"], "house_winner": house.races["leader_party_id"]}
 )
 
-merged = pres_df.merge(house_df, on="CD")
+merged = pres_df.merge(house_df, on="cd").drop(columns="cd")
 merged.to_csv('out.csv', index=False)
 
 biden_voters_in_rep_cds = sum(merged[merged['house_winner'] == 'republican']['Biden'])
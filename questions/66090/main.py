@@ -1,7 +1,4 @@
 import pandas as pd
-import requests
-import time
-import geopandas as gpd
 from matplotlib import pyplot as plt
 from matplotlib.pyplot import cm
 import matplotlib.colors as mcol
@@ -9,252 +6,294 @@ import matplotlib.patches as mpatches
 import adjustText
 import numpy as np
 import seaborn as sns
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.crawl import crawl
+from common.pipeline import Pipeline
+from common import basemap, enr, precinct, raster, render, tiles
+
+pipeline = Pipeline(__file__)
+
 
 # Scrape mayoral results, included for completeness.
 # can instead use rep_primary.csv or dem_primary.csv in repo
 
-rep_df = pd.DataFrame({"ad": [], "ed": [], "silwa": [], "mateo": [], "writein": []})
-
-for ad in range(23, 88):
-    url = f"https://web.enrboenyc.us/CD24425AD{ad}0.html"
-    df = pd.read_html(url)[2]
-    df = df[2:-1]
-
-    df["ad"] = ad
-    df["ed"] = df[0].apply(lambda x: int(x.split()[1]))
-    df["silwa"] = df[3]
-    df["mateo"] = df[5]
-    df["writein"] = df[7]
-    rep_df = pd.concat([rep_df, df[["ad", "ed", "silwa", "mateo", "writein"]]])
-    time.sleep(10)
-
-dem_df = pd.DataFrame(
-    {
-        "ad": [],
-        "ed": [],
-        "foldenauer": [],
-        "morales": [],
-        "stringer": [],
-        "mcguire": [],
-        "wiley": [],
-        "prince": [],
-        "chang": [],
-        "garcia": [],
-        "adams": [],
-        "wright jr": [],
-        "donovan": [],
-        "yang": [],
-        "taylor": [],
-        "writein": [],
-    }
-)
 
-for ad in range(63, 88):
-    url = f"https://web.enrboenyc.us/CD24306AD{ad}0.html"
-    df = pd.read_html(url)[2]
-    df = df[2:-1]
-
-    df["ad"] = ad
-    df["ed"] = df[0].apply(lambda x: int(x.split()[1]))
-    df["foldenauer"] = df[3]
-    df["morales"] = df[5]
-    df["stringer"] = df[7]
-    df["mcguire"] = df[9]
-    df["wiley"] = df[11]
-    df["prince"] = df[13]
-    df["chang"] = df[15]
-    df["garcia"] = df[17]
-    df["adams"] = df[19]
-    df["wright jr"] = df[21]
-    df["donovan"] = df[23]
-    df["yang"] = df[25]
-    df["taylor"] = df[27]
-    df["writein"] = df[29]
-    dem_df = pd.concat(
-        [
-            dem_df,
-            df[
-                [
-                    "ad",
-                    "ed",
-                    "foldenauer",
-                    "morales",
-                    "stringer",
-                    "mcguire",
-                    "wiley",
-                    "prince",
-                    "chang",
-                    "garcia",
-                    "adams",
-                    "wright jr",
-                    "donovan",
-                    "yang",
-                    "taylor",
-                    "writein",
-                ]
-            ],
-        ]
-    )
-    time.sleep(10)
-
-# Identify shut-out precincts
-rep_df = rep_df[rep_df["silwa"] + rep_df["mateo"] + rep_df["writein"] == 0]
-
-# Identify precincts with at least 50 votes
-dem_df = dem_df[
-    dem_df["foldenauer"]
-    + dem_df["morales"]
-    + dem_df["stringer"]
-    + dem_df["mcguire"]
-    + dem_df["wiley"]
-    + dem_df["prince"]
-    + dem_df["chang"]
-    + dem_df["garcia"]
-    + dem_df["adams"]
-    + dem_df["wright jr"]
-    + dem_df["donovan"]
-    + dem_df["yang"]
-    + dem_df["taylor"]
-    + dem_df["writein"]
-    >= 50
+# Candidates in the order they appear on the ENR pages
+REP_CANDIDATES = ["silwa", "mateo", "writein"]
+DEM_CANDIDATES = [
+    "foldenauer",
+    "morales",
+    "stringer",
+    "mcguire",
+    "wiley",
+    "prince",
+    "chang",
+    "garcia",
+    "adams",
+    "wright jr",
+    "donovan",
+    "yang",
+    "taylor",
+    "writein",
 ]
 
-# Inner merge to get the precincts we're interested in - shut-out_districts.csv
-merged = pd.merge(
-    rep_df, dem_df, how="inner", on=["ad", "ed"], suffixes=["_rep", "_dem"]
-)
-merged = merged[merged.columns.difference(["mateo", "silwa", "writein_rep"])]
-
-# Plot vote-shares in Democratic primary
-fig, ax = plt.subplots(1, dpi=800)
-totals = merged[merged.columns.difference(["ad", "ed"])].sum()
-labels = [x.capitalize() for x in totals.index]
-colours = cm.rainbow(np.linspace(0, 1, len(labels)))
-patches, texts = ax.pie(
-    merged[merged.columns.difference(["ad", "ed"])].sum(), colors=colours
-)
-labels = [
-    f"{x.capitalize()} - {round(100*totals[x]/sum(totals), 1)}%" for x in totals.index
-]
-ax.legend(patches, labels, bbox_to_anchor=(0, 1))
-plt.savefig("precinct_pie.png", bbox_inches="tight", pad_inches=0, dpi=800)
-
-
-merged["winner"] = merged[merged.columns.difference(["ad", "ed"])].idxmax(axis=1)
-merged["ElectDist"] = merged.apply(
-    lambda x: f"{x['ad']}{str(x['ed']).zfill(3)}", axis=1
-).astype(int)
-
-# Read shapefile - not included in repo
-# https://www1.nyc.gov/site/planning/data-maps/open-data/districts-download-metadata.page
-map_df = gpd.read_file("nyed.shp")
-
-# Plot map of Democratic primary
-merged_map = map_df.merge(merged, on="ElectDist", how="outer")
-merged_map["colour"] = merged_map["winner"].apply(
-    lambda x: "r"
-    if x == "adams"
-    else "b"
-    if x == "wiley"
-    else "g"
-    if x == "garcia"
-    else "y"
-    if x == "yang"
-    else "white"
+
+def parse_rep(path, ad):
+    return enr.read(path).frame(REP_CANDIDATES, ad=ad)
+
+
+def parse_dem(path, ad):
+    return enr.read(path).frame(DEM_CANDIDATES, ad=ad)
+
+
+# Always rerun: the pages it needs aren't known up front, and crawl() only
+# refetches ones whose cached copy has expired
+@pipeline.stage(outputs=["rep_primary.csv", "dem_primary.csv"], always=True)
+def scrape():
+    # Pages are fetched a few at a time and each AD is checkpointed, so rerunning
+    # after a failure only fetches the ADs that are missing.
+    rep_df = crawl(
+        {ad: f"https://web.enrboenyc.us/CD24425AD{ad}0.html" for ad in range(23, 88)},
+        parse_rep,
+        "CD24425",
+    ).astype(int)
+    rep_df.to_csv("rep_primary.csv", index=False)
+
+    dem_df = crawl(
+        {ad: f"https://web.enrboenyc.us/CD24306AD{ad}0.html" for ad in range(23, 88)},
+        parse_dem,
+        "CD24306",
+    ).astype(int)
+    dem_df.to_csv("dem_primary.csv", index=False)
+
+
+@pipeline.stage(
+    inputs=["rep_primary.csv", "dem_primary.csv"], outputs=["shut-out_districts.csv"]
 )
+def merge():
+    rep_df = pd.read_csv("rep_primary.csv")
+    dem_df = pd.read_csv("dem_primary.csv")
+
+    # Identify shut-out precincts
+    rep_df = rep_df[rep_df["silwa"] + rep_df["mateo"] + rep_df["writein"] == 0]
+
+    # Identify precincts with at least 50 votes
+    dem_df = dem_df[
+        dem_df["foldenauer"]
+        + dem_df["morales"]
+        + dem_df["stringer"]
+        + dem_df["mcguire"]
+        + dem_df["wiley"]
+        + dem_df["prince"]
+        + dem_df["chang"]
+        + dem_df["garcia"]
+        + dem_df["adams"]
+        + dem_df["wright jr"]
+        + dem_df["donovan"]
+        + dem_df["yang"]
+        + dem_df["taylor"]
+        + dem_df["writein"]
+        >= 50
+    ]
+
+    # Inner merge to get the precincts we're interested in
+    merged = pd.merge(
+        rep_df, dem_df, how="inner", on=["ad", "ed"], suffixes=["_rep", "_dem"]
+    )
+    merged.to_csv("shut-out_districts.csv", index=False)
+
+
+def shut_out_districts():
+    merged = pd.read_csv("shut-out_districts.csv")
+    return merged[merged.columns.difference(["mateo", "silwa", "writein_rep"])]
+
+
+def read_map(pixels=None):
+    # Read shapefile - not included in repo
+    # https://www1.nyc.gov/site/planning/data-maps/open-data/districts-download-metadata.page
+    map_df = basemap.load("nyed.shp", epsg=None, pixels=pixels)
+    map_df["ElectDist"] = precinct.parse_electdist(map_df["ElectDist"])
+    return map_df
+
+
+@pipeline.stage(inputs=["shut-out_districts.csv"], outputs=["precinct_pie.png"])
+def pie():
+    merged = shut_out_districts()
+
+    # Plot vote-shares in Democratic primary
+    fig, ax = plt.subplots(1, dpi=render.dpi(800))
+    totals = merged[merged.columns.difference(["ad", "ed"])].sum()
+    labels = [x.capitalize() for x in totals.index]
+    colours = cm.rainbow(np.linspace(0, 1, len(labels)))
+    patches, texts = ax.pie(
+        merged[merged.columns.difference(["ad", "ed"])].sum(), colors=colours
+    )
+    labels = [
+        f"{x.capitalize()} - {round(100*totals[x]/sum(totals), 1)}%" for x in totals.index
+    ]
+    ax.legend(patches, labels, bbox_to_anchor=(0, 1))
+    render.savefig("precinct_pie.png", bbox_inches="tight", pad_inches=0, dpi=800)
+
+
+def primary_results(map_df):
+    merged = shut_out_districts()
+    merged["winner"] = merged[merged.columns.difference(["ad", "ed"])].idxmax(axis=1)
+    merged["ElectDist"] = precinct.encode(merged["ad"], merged["ed"])
+
+    merged_map = map_df.merge(merged, on="ElectDist", how="outer")
+    merged_map["colour"] = (
+        merged_map["winner"]
+        .map({"adams": "r", "wiley": "b", "garcia": "g", "yang": "y"})
+        .fillna("white")
+    )
+    return merged_map
+
 
-fig, ax = plt.subplots(1, dpi=800)
-merged_map.plot(
-    facecolor=merged_map["colour"],
-    ax=ax,
-    legend=False,
-    edgecolor="black",
-    linewidth=0.1,
+@pipeline.stage(
+    inputs=["shut-out_districts.csv", "nyed.shp"], outputs=["precinct_map.png"]
 )
-ax.axis("off")
-ax.set_title(
-    "2021 Democratic Mayoral Primary Results\n (Republican Shut-out Districts)",
-    fontsize=12,
+def primary_map():
+    # Plot map of Democratic primary
+    merged_map = primary_results(read_map(render.pixels(800)))
+
+    fig, ax = plt.subplots(1, dpi=render.dpi(800))
+    raster.plot(
+        merged_map,
+        ax,
+        facecolor=merged_map["colour"],
+        edgecolor="black",
+        linewidth=0.1,
+    )
+    ax.axis("off")
+    ax.set_title(
+        "2021 Democratic Mayoral Primary Results\n (Republican Shut-out Districts)",
+        fontsize=12,
+    )
+    ax.legend(
+        handles=[
+            mpatches.Patch(
+                color="r",
+                label=f'Adams ({merged_map["colour"].value_counts().get("r",0)})',
+            ),
+            mpatches.Patch(
+                color="b",
+                label=f'Wiley ({merged_map["colour"].value_counts().get("b",0)})',
+            ),
+            mpatches.Patch(
+                color="g",
+                label=f'Garcia ({merged_map["colour"].value_counts().get("g",0)})',
+            ),
+            mpatches.Patch(
+                color="y",
+                label=f'Yang ({merged_map["colour"].value_counts().get("y",0)})',
+            ),
+        ],
+        loc="upper left",
+        prop={"size": 4.5},
+    )
+    render.savefig("precinct_map.png", bbox_inches="tight", pad_inches=0, dpi=800)
+
+
+def presidential_results():
+    # Read in 2020 presidential data and pivot to get party vote count
+    df_2020 = pd.read_csv("2020_ADED.csv")
+    df_2020["Party"] = df_2020["Candidate"].apply(
+        lambda x: "Rep" if "Donald" in x else "Dem" if "Biden" in x else np.nan
+    )
+    df_2020 = df_2020[df_2020["Party"].isin(["Dem", "Rep"])]
+    df_2020["ElectDist"] = precinct.encode(df_2020["AD"], df_2020["ED"])
+    df_2020 = df_2020.pivot_table(
+        index="ElectDist", columns="Party", values="Votes", aggfunc="sum"
+    ).reset_index()
+
+    merged = shut_out_districts()
+    merged["ElectDist"] = precinct.encode(merged["ad"], merged["ed"])
+
+    merged = merged[["ad", "ed", "ElectDist"]].merge(df_2020, on="ElectDist")
+    merged["Dem Percent"] = (
+        merged["Dem"] / (merged["Rep"] + merged["Dem"]) * 100
+    ).astype(float)
+    return merged
+
+
+@pipeline.stage(
+    inputs=["shut-out_districts.csv", "2020_ADED.csv", "nyed.shp"],
+    outputs=["2020_boxplot.png", "precinct_map_2020.png"],
 )
-ax.legend(
-    handles=[
-        mpatches.Patch(
-            color="r",
-            label=f'Adams ({merged_map["colour"].value_counts().get("r",0)})',
-        ),
-        mpatches.Patch(
-            color="b",
-            label=f'Wiley ({merged_map["colour"].value_counts().get("b",0)})',
-        ),
-        mpatches.Patch(
-            color="g",
-            label=f'Garcia ({merged_map["colour"].value_counts().get("g",0)})',
-        ),
-        mpatches.Patch(
-            color="y",
-            label=f'Yang ({merged_map["colour"].value_counts().get("y",0)})',
+def presidential():
+    merged = presidential_results()
+    print(merged["Dem Percent"].describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95]))
+
+    # Plot boxplot
+    fig, ax = plt.subplots(figsize=(8, 2))
+    sns.boxenplot(
+        x="Dem Percent",
+        data=merged,
+        ax=ax,
+    )
+    render.savefig("2020_boxplot.png", bbox_inches="tight", pad_inches=0, dpi=800)
+
+    # Plot 2020 presidential election map
+    map_df = read_map(render.pixels(800))
+    merged_map = map_df.merge(merged, on="ElectDist", how="outer")
+
+    fig, ax = plt.subplots()
+    cm1 = mcol.LinearSegmentedColormap.from_list("RWB", ["r", "w", "b"])
+    raster.plot(
+        merged_map,
+        ax,
+        column="Dem Percent",
+        cmap=cm1,
+        legend=True,
+        legend_kwds={"shrink": 0.7},
+        edgecolor="0.5",
+        linewidth=0.25,
+        missing_kwds=dict(
+            color="white",
         ),
-    ],
-    loc="upper left",
-    prop={"size": 4.5},
-)
-plt.savefig("precinct_map.png", bbox_inches="tight", pad_inches=0, dpi=800)
+    )
+    ax.axis("off")
+    ax.set_title(
+        "Democrat two-party vote-share \n (Republican 2021 Mayoral Primary Shut-out Districts)",
+        size=9,
+    )
+    render.savefig("precinct_map_2020.png", bbox_inches="tight", pad_inches=0, dpi=700)
 
-# Read in 2020 presidential data and pivot to get party vote count
-df_2020 = pd.read_csv("2020_ADED.csv")
-df_2020["Party"] = df_2020["Candidate"].apply(
-    lambda x: "Rep" if "Donald" in x else "Dem" if "Biden" in x else np.nan
-)
-df_2020 = df_2020[df_2020["Party"].isin(["Dem", "Rep"])]
-df_2020["ElectDist"] = df_2020.apply(
-    lambda x: f"{x['AD']}{str(x['ED']).zfill(3)}", axis=1
-).astype(int)
-df_2020 = df_2020.pivot_table(
-    index="ElectDist", columns="Party", values="Votes", aggfunc="sum"
-).reset_index()
-
-merged = pd.merge(
-    rep_df, dem_df, how="inner", on=["ad", "ed"], suffixes=["_rep", "_dem"]
-)
-merged["ElectDist"] = merged.apply(
-    lambda x: f"{x['ad']}{str(x['ed']).zfill(3)}", axis=1
-).astype(int)
 
-merged = merged[["ad", "ed", "ElectDist"]].merge(df_2020, on="ElectDist")
-merged["Dem Percent"] = (merged["Dem"] / (merged["Rep"] + merged["Dem"]) * 100).astype(
-    float
-)
-print(merged["Dem Percent"].describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95]))
-
-# Plot boxplot
-fig, ax = plt.subplots(figsize=(8, 2))
-sns.boxenplot(
-    x="Dem Percent",
-    data=merged,
-    ax=ax,
-)
-plt.savefig("2020_boxplot.png", bbox_inches="tight", pad_inches=0, dpi=800)
-
-# Plot 2020 presidential election map
-merged_map = map_df.merge(merged, on="ElectDist", how="outer")
-
-fig, ax = plt.subplots()
-cm1 = mcol.LinearSegmentedColormap.from_list("RWB", ["r", "w", "b"])
-merged_map.plot(
-    column="Dem Percent",
-    ax=ax,
-    cmap=cm1,
-    legend=True,
-    legend_kwds={"shrink": 0.7},
-    edgecolor="0.5",
-    linewidth=0.25,
-    missing_kwds=dict(
-        color="white",
-    ),
-)
-ax.axis("off")
-ax.set_title(
-    "Democrat two-party vote-share \n (Republican 2021 Mayoral Primary Shut-out Districts)",
-    size=9,
-)
-plt.savefig("precinct_map_2020.png", bbox_inches="tight", pad_inches=0, dpi=700)
+if tiles.REQUESTED:
+
+    @pipeline.stage(
+        inputs=["shut-out_districts.csv", "2020_ADED.csv", "nyed.shp"],
+        outputs=[
+            tiles.directory("precinct_map", pipeline.name) / "index.html",
+            tiles.directory("precinct_map_2020", pipeline.name) / "index.html",
+        ],
+        parallel=True,
+    )
+    def export_tiles():
+        # Zoomable versions of both maps, at full resolution
+        map_df = read_map()
+        merged_map = primary_results(map_df)
+        tiles.export(
+            merged_map,
+            "precinct_map",
+            pipeline.name,
+            facecolor=merged_map["colour"],
+        )
+
+        merged_map = map_df.merge(presidential_results(), on="ElectDist", how="outer")
+        tiles.export(
+            merged_map,
+            "precinct_map_2020",
+            pipeline.name,
+            column="Dem Percent",
+            cmap=mcol.LinearSegmentedColormap.from_list("RWB", ["r", "w", "b"]),
+            missing_kwds=dict(color="white"),
+            edgecolor="0.5",
+        )
+
+
+pipeline.run()
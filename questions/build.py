@@ -0,0 +1,85 @@
+"""
+Rebuild every question's outputs, several questions at a time.
+
+    python build.py                 # everything
+    python build.py 60654 66090     # just these
+    python build.py -j 4 --preview  # 4 at a time, draft renders
+
+Each question's main.py runs in its own process on the Agg backend, and the
+cores left over are shared out between them for their own parallel figures.
+Finishes with a report of how long each question and each figure took.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+QUESTIONS = Path(__file__).resolve().parent
+
+
+def build(question, args, env):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "main.py"] + args,
+        cwd=question,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("questions", nargs="*", help="question ids (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--preview", action="store_true", help="draft renders")
+    parser.add_argument("--force", action="store_true", help="rerun every stage")
+    args = parser.parse_args()
+
+    questions = sorted(
+        p.parent
+        for p in QUESTIONS.glob("*/main.py")
+        if not args.questions or p.parent.name in args.questions
+    )
+    script_args = [a for a in ("--preview", "--force") if getattr(args, a[2:])]
+
+    fd, timings = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    env = dict(
+        os.environ,
+        MPLBACKEND="Agg",
+        SE_TIMINGS=timings,
+        SE_JOBS=str(max(1, (os.cpu_count() or 1) // args.jobs)),
+    )
+
+    failed = []
+    with ThreadPoolExecutor(args.jobs) as pool:
+        futures = {q: pool.submit(build, q, script_args, env) for q in questions}
+        print(f"{'question':<10}{'seconds':>9}  status")
+        for question, future in futures.items():
+            result, seconds = future.result()
+            status = "ok" if result.returncode == 0 else "FAILED"
+            print(f"{question.name:<10}{seconds:>9.1f}  {status}")
+            if result.returncode != 0:
+                failed.append(question.name)
+                print(result.stderr.strip().splitlines()[-1] if result.stderr else "")
+
+    with open(timings) as f:
+        records = [json.loads(line) for line in f]
+    os.remove(timings)
+    if records:
+        print(f"\n{'figure (time in savefig)':<40}{'seconds':>9}")
+        for r in sorted(records, key=lambda r: -r["seconds"]):
+            print(f"{r['question'] + '/' + r['figure']:<40}{r['seconds']:>9.1f}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Helpers shared between the question scripts. Each questions/<id>/main.py is
+# run from its own folder, so they put the questions folder on sys.path before
+# importing from here.
@@ -0,0 +1,138 @@
+import hashlib
+import json
+from pathlib import Path
+
+import geopandas as gpd
+
+from .fetch import CACHE_DIR
+
+# Inset adjustments applied after projecting, as name -> (scale, x offset, y offset).
+# These move Alaska and Hawaii under the lower 48 in EPSG:2163.
+STATE_INSETS = {
+    "Alaska": (0.6, 1700000, -5000000),
+    "Hawaii": (1, 6000000, -1800000),
+}
+COUNTY_INSETS = {
+    "Hawaii": (1, 5500000, -1800000),
+}
+
+SIDECARS = (".shp", ".shx", ".dbf", ".prj")
+
+# Simplified copies are kept for maps this many pixels across. Each level's
+# tolerance is the map's width divided by its pixel count, so at or below that
+# output size the dropped vertices are smaller than a pixel.
+LEVELS = (1000, 4000, 16000)
+
+
+def _source_hash(path):
+    """
+    Hash of the shapefile's sidecars. It's remembered in a small stamp next to
+    the cached frames along with each sidecar's size and mtime, and the files
+    are only read and hashed again when one of those changes.
+    """
+    parts = [path.with_suffix(suffix) for suffix in SIDECARS]
+    stat = [
+        [part.suffix, st.st_size, st.st_mtime_ns]
+        for part in parts
+        if part.exists()
+        for st in [part.stat()]
+    ]
+    name = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+    stamp = CACHE_DIR / "basemap" / "stamps" / f"{path.stem}-{name}.json"
+    if stamp.exists():
+        saved = json.loads(stamp.read_text())
+        if saved["stat"] == stat:
+            return saved["hash"]
+
+    h = hashlib.sha256()
+    for part in parts:
+        if part.exists():
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+    stamp.parent.mkdir(parents=True, exist_ok=True)
+    stamp.write_text(json.dumps({"stat": stat, "hash": h.hexdigest()}))
+    return h.hexdigest()
+
+
+def _build(path, epsg, insets, column):
+    gdf = gpd.read_file(path)
+    if epsg is not None:
+        gdf = gdf.to_crs(epsg=epsg)
+    for name, (scale, dx, dy) in insets.items():
+        m = gdf[column] == name
+        geometry = gdf.loc[m].geometry
+        if scale != 1:
+            geometry = geometry.scale(scale, scale, scale)
+        gdf.loc[m, "geometry"] = geometry.translate(dx, dy)
+    return gdf
+
+
+def _save(gdf, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    gdf.to_parquet(tmp)
+    tmp.replace(path)
+
+
+def _level_path(cached, level):
+    return cached.with_name(f"{cached.stem}-L{level}.parquet")
+
+
+def _save_levels(gdf, cached):
+    minx, miny, maxx, maxy = gdf.total_bounds
+    width = max(maxx - minx, maxy - miny)
+    for level in LEVELS:
+        simplified = gdf.copy()
+        simplified["geometry"] = gdf.geometry.simplify(
+            width / level, preserve_topology=True
+        )
+        _save(simplified, _level_path(cached, level))
+
+
+def level_for(pixels):
+    """The coarsest simplification level good enough for a map `pixels` wide."""
+    return next((level for level in LEVELS if level >= pixels), None)
+
+
+def load(path, epsg=2163, insets=None, column="NAME", pixels=None):
+    """
+    Read a shapefile projected to epsg with inset adjustments applied.
+
+    The result is saved as GeoParquet under .cache/basemap, keyed on the
+    shapefile's contents, the projection and the insets, so later calls just
+    read that back. Passing `pixels`, the width of the rendered map, returns the
+    simplified copy from LEVELS matching that size (built on first use), or the
+    full-resolution geometry if the map is larger than any level.
+    """
+    path = Path(path)
+    insets = insets or {}
+    key = hashlib.sha256(
+        f"{_source_hash(path)}:{epsg}:{sorted(insets.items())}:{column}".encode()
+    ).hexdigest()[:16]
+    cached = CACHE_DIR / "basemap" / f"{path.stem}-{epsg}-{key}.parquet"
+
+    level = level_for(pixels) if pixels else None
+    target = cached if level is None else _level_path(cached, level)
+    if target.exists():
+        return gpd.read_parquet(target)
+
+    if cached.exists():
+        gdf = gpd.read_parquet(cached)
+    else:
+        gdf = _build(path, epsg, insets, column)
+        _save(gdf, cached)
+    if level is None:
+        return gdf
+    _save_levels(gdf, cached)
+    return gpd.read_parquet(target)
+
+
+def us_states(path="cb_2018_us_state_500k.shp", epsg=2163, pixels=None):
+    """Census cartographic state boundaries with Alaska and Hawaii moved in."""
+    return load(path, epsg, STATE_INSETS, "NAME", pixels)
+
+
+def us_counties(path="tl_2019_us_county.shp", epsg=2163, pixels=None):
+    """TIGER county boundaries with Hawaii moved in."""
+    return load(path, epsg, COUNTY_INSETS, "STATE_NAME", pixels)
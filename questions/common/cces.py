@@ -0,0 +1,49 @@
+import pandas as pd
+
+# Data not included in repo - see https://cces.gov.harvard.edu
+# The yearly common content files have hundreds of columns and we only ever
+# want a handful, so read just those, with compact types where we know them.
+DTYPES = {
+    "inputstate": "Int8",
+    "pid3": "Int8",
+    "pid7": "Int8",
+    "commonweight": "float64",
+    # Cumulative file
+    "year": "Int16",
+    "state": "category",
+    "st": "category",
+    "weight": "float64",
+    "weight_cumulative": "float64",
+}
+
+CHUNKSIZE = 250000
+
+
+def read(path, columns, chunksize=None):
+    """
+    Read only `columns` from a CCES csv, using DTYPES where they're known.
+
+    With chunksize this returns an iterator of DataFrames instead.
+    """
+    return pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={c: DTYPES[c] for c in columns if c in DTYPES},
+        chunksize=chunksize,
+        low_memory=False,
+    )
+
+
+def weighted_counts(path, by, weight="commonweight", chunksize=CHUNKSIZE):
+    """
+    Sum of `weight` for each combination of the `by` columns.
+
+    The file is read in chunks and the sums accumulated as we go, so memory use
+    depends on chunksize and the number of groups rather than the file size -
+    which is what makes the multi-year cumulative file manageable.
+    """
+    total = None
+    for chunk in read(path, list(by) + [weight], chunksize):
+        sums = chunk.groupby(by, observed=True)[weight].sum()
+        total = sums if total is None else total.add(sums, fill_value=0)
+    return total
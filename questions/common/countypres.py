@@ -0,0 +1,246 @@
+import hashlib
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import geo
+from .fetch import CACHE_DIR, fetch
+
+# MIT Election Data and Science Lab county presidential returns, 2000 onwards
+SOURCE = "https://dataverse.harvard.edu/api/access/datafile/3641280?format=original&gbrecs=true"
+
+DTYPES = {
+    "year": "int16",
+    "state": "category",
+    "state_po": "category",
+    "county": "category",
+    "FIPS": "float64",
+    "office": "category",
+    "candidate": "category",
+    "party": "category",
+    "candidatevotes": "float64",
+    "totalvotes": "float64",
+}
+
+
+def ingest(url=SOURCE):
+    """
+    Convert the csv into a parquet dataset partitioned by year, once per version
+    of the source file, returning its path.
+
+    FIPS and vote counts become nullable integers and the text columns
+    categoricals, so reading a year back only touches that year's files.
+    """
+    source = fetch(url)
+    # fetch() names files by their content hash, so a new upload gets a new dataset
+    dataset = CACHE_DIR / "countypres" / source.name
+    if dataset.exists():
+        return dataset
+
+    df = pd.read_csv(source, dtype=DTYPES, usecols=lambda c: c in DTYPES)
+    for column in ("FIPS", "candidatevotes", "totalvotes"):
+        df[column] = df[column].round().astype("Int64")
+    df["FIPS"] = df["FIPS"].astype("Int32")
+
+    tmp = dataset.with_suffix(".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    df.to_parquet(tmp, partition_cols=["year"], index=False)
+    tmp.rename(dataset)
+    return dataset
+
+
+def load(year, parties=None, url=SOURCE):
+    """
+    Rows for one election year (or every year if None), optionally only for
+    the given parties.
+    """
+    filters = [("year", "=", year)] if year is not None else []
+    if parties is not None:
+        filters.append(("party", "in", list(parties)))
+    df = pd.read_parquet(ingest(url), filters=filters or None)
+    df["party"] = df["party"].cat.remove_unused_categories()
+    if year is not None:
+        return df.drop(columns="year")
+    df["year"] = df["year"].astype(int)
+    return df
+
+
+def two_party(year, url=SOURCE):
+    """
+    Democratic and Republican votes by county for one year, with FIPS as a
+    zero-padded string like the other county sources.
+    """
+    df = load(year, ["democrat", "republican"], url)
+    df = df[df["FIPS"].notna()]
+    df = df.pivot(index="FIPS", columns="party", values="candidatevotes").reset_index()
+    df.columns.name = None
+    df["FIPS"] = geo.fips(df["FIPS"])
+    return df
+
+
+class VoteMatrix:
+    """
+    Democratic and Republican votes as dense counties x years arrays.
+
+    Every query works on whole columns at once: share(2016) is the Democratic
+    share of the two-party vote in every county, swing(2016, 2020) the change
+    in it, and swings() the change between every pair of years. Single years
+    come back as Series indexed by zero-padded FIPS; counties missing from a
+    year are NaN.
+    """
+
+    def __init__(self, fips, years, votes):
+        self.fips = pd.Index(geo.fips(fips), name="FIPS")
+        self.years = [int(y) for y in years]
+        # votes[0] is Democratic, votes[1] Republican
+        self.votes = votes
+
+    @property
+    def democrat(self):
+        return self.votes[0]
+
+    @property
+    def republican(self):
+        return self.votes[1]
+
+    def _column(self, year):
+        try:
+            return self.years.index(year)
+        except ValueError:
+            raise KeyError(f"no results for {year} (have {self.years})") from None
+
+    def _series(self, values, name):
+        return pd.Series(values, index=self.fips, name=name)
+
+    def shares(self):
+        """Democratic percentage of the two-party vote, counties x years."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.democrat / (self.democrat + self.republican) * 100
+
+    def share(self, year):
+        return self._series(self.shares()[:, self._column(year)], year)
+
+    def margin(self, year):
+        """Democratic minus Republican, as a percentage of the two-party vote."""
+        return self._series(2 * self.shares()[:, self._column(year)] - 100, year)
+
+    def swing(self, start, end):
+        """Change in Democratic two-party share, in percentage points."""
+        shares = self.shares()
+        change = shares[:, self._column(end)] - shares[:, self._column(start)]
+        return self._series(change, f"{start}-{end}")
+
+    def swings(self):
+        """
+        Swing between every pair of years as a counties x years x years array,
+        where swings()[:, i, j] is the swing from years[i] to years[j].
+        """
+        shares = self.shares()
+        return shares[:, None, :] - shares[:, :, None]
+
+
+def _frame_hash(df):
+    values = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(values.tobytes()).hexdigest()
+
+
+# Bumped whenever the way the arrays are built changes, so older caches aren't
+# reused
+MATRIX_FORMAT = 2
+
+
+def matrix(extra=None, url=SOURCE):
+    """
+    The VoteMatrix for every year in the dataset, plus any extra years given as
+    {year: frame with FIPS/democrat/republican columns} (e.g. 2020 from
+    fox.load_counties).
+
+    The arrays are built once per version of the inputs and saved under
+    .cache/countypres, then memory-mapped rather than read on later calls.
+    """
+    extra = {
+        year: df[["FIPS", "democrat", "republican"]]
+        for year, df in sorted((extra or {}).items())
+    }
+    h = hashlib.sha256(f"{MATRIX_FORMAT}:{ingest(url).name}".encode())
+    for year, df in extra.items():
+        h.update(f"{year}:{_frame_hash(df)}".encode())
+    directory = CACHE_DIR / "countypres" / f"matrix-{h.hexdigest()[:16]}"
+
+    if not directory.exists():
+        df = load(None, ["democrat", "republican"], url)
+        df = df[df["FIPS"].notna()][["FIPS", "year", "party", "candidatevotes"]]
+        df["party"] = df["party"].astype(str)
+        df = df.rename(columns={"candidatevotes": "votes"})
+        for year, other in extra.items():
+            other = other.melt(
+                id_vars="FIPS", var_name="party", value_name="votes"
+            ).assign(year=year, FIPS=lambda d: d["FIPS"].astype(int))
+            df = pd.concat([df[df["year"] != year], other], ignore_index=True)
+        df["FIPS"] = df["FIPS"].astype(int)
+
+        # min_count=1 keeps a county/party/year with no votes recorded as NaN
+        # rather than 0, which would make it a 0% or 100% share
+        grid = (
+            df.groupby(["FIPS", "party", "year"])["votes"]
+            .sum(min_count=1)
+            .unstack(["party", "year"])
+        )
+        years = np.array(sorted(df["year"].unique()), dtype=np.int16)
+        votes = np.stack(
+            [
+                grid[party].reindex(columns=years).to_numpy(dtype=np.float64)
+                for party in ("democrat", "republican")
+            ]
+        )
+
+        tmp = directory.with_suffix(".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / "fips.npy", grid.index.to_numpy(dtype=np.int32))
+        np.save(tmp / "years.npy", years)
+        np.save(tmp / "votes.npy", votes)
+        tmp.rename(directory)
+
+    return VoteMatrix(
+        np.load(directory / "fips.npy"),
+        np.load(directory / "years.npy"),
+        np.load(directory / "votes.npy", mmap_mode="r"),
+    )
+
+
+# ----- Benchmark: python -m common.countypres -----
+
+
+def _swing_rowwise(df):
+    # The per-row version the question scripts used to run
+    return df.apply(
+        lambda x: (x["democrat_y"] / (x["republican_y"] + x["democrat_y"])) * 100
+        - (x["democrat_x"] / (x["republican_x"] + x["democrat_x"])) * 100,
+        axis=1,
+    )
+
+
+if __name__ == "__main__":
+    from .fox import load_counties
+
+    votes = matrix({2020: load_counties()})
+    print(f"{len(votes.fips)} counties x {len(votes.years)} years {votes.years}")
+
+    start = time.perf_counter()
+    votes.swings()
+    t_all = time.perf_counter() - start
+    n = len(votes.years)
+    print(f"all {n * (n - 1) // 2} pairs of years: {t_all * 1000:.1f}ms")
+
+    merged = two_party(2016).merge(load_counties(), on="FIPS")
+    start = time.perf_counter()
+    old = _swing_rowwise(merged)
+    t_old = time.perf_counter() - start
+    start = time.perf_counter()
+    new = votes.swing(2016, 2020)
+    t_new = time.perf_counter() - start
+    np.testing.assert_allclose(old.to_numpy(), new[merged["FIPS"]].to_numpy())
+    print(f"2016-2020: row-wise {t_old:.3f}s, matrix {t_new * 1000:.2f}ms")
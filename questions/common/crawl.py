@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from .fetch import CACHE_DIR, cached, fetch
+from .pipeline import code_hash
+
+
+class TokenBucket:
+    """Allow `rate` requests per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _checkpoint(path, df):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp", suffix=".csv")
+    os.close(fd)
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _parse(source, key, parse, path):
+    df = parse(source, key)
+    _checkpoint(path, df)
+    # Checkpoints for older versions of the page or parser won't be read again
+    for old in path.parent.glob("*.csv"):
+        if old != path:
+            old.unlink()
+    return df
+
+
+async def _crawl(pages, parse, checkpoint_dir, concurrency, rate, burst):
+    buckets = defaultdict(lambda: TokenBucket(rate, burst))
+    slots = asyncio.Semaphore(concurrency)
+    parser = code_hash(parse)
+
+    async def run(key, url):
+        async with slots:
+            # A page whose cached copy is still fresh is used without waiting
+            # for the limiter; anything else, including revalidating an expired
+            # copy, is a request and waits its turn
+            source = await asyncio.to_thread(cached, url)
+            if source is None:
+                await buckets[urlsplit(url).netloc].acquire()
+                source = await asyncio.to_thread(fetch, url)
+            # Checkpointed per version of the page and of the parser, so only
+            # changed pages are parsed again, and all of them if parse changes
+            version = hashlib.sha256(f"{parser}:{source.name}".encode()).hexdigest()
+            path = checkpoint_dir / str(key) / f"{version}.csv"
+            if path.exists():
+                return pd.read_csv(path)
+            return await asyncio.to_thread(_parse, source, key, parse, path)
+
+    return await asyncio.gather(*(run(key, url) for key, url in pages.items()))
+
+
+def crawl(pages, parse, name, concurrency=4, rate=1.0, burst=2):
+    """
+    Fetch and parse a set of pages concurrently, returning the concatenated frames.
+
+    `pages` maps a key (e.g. an assembly district) to its URL and parse(path, key)
+    turns a downloaded page into a DataFrame. Pages are only requested again
+    once their cached copy is older than their TTL in fetch.SOURCES, and
+    requests to each host are limited to `rate` per second. Each parsed page is
+    checkpointed under .cache/crawl/<name>/<key>/, named for the version of the
+    page and of parse (its code, the script constants it reads and the common
+    modules it uses), so an interrupted crawl picks up where it stopped and a
+    fix to the parser applies to every page.
+    """
+    checkpoint_dir = CACHE_DIR / "crawl" / name
+    dfs = asyncio.run(_crawl(pages, parse, checkpoint_dir, concurrency, rate, burst))
+    return pd.concat(dfs, ignore_index=True)
@@ -0,0 +1,115 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from . import precinct
+from .fetch import fetch
+
+# An NYC Board of Elections ED-level results csv, and the positions of its AD,
+# ED, unit name (candidate/party line) and tally columns, which move between
+# years.
+Contest = namedtuple("Contest", ["url", "columns"])
+
+_RESULTS = "https://vote.nyc/sites/default/files/pdf/election_results"
+
+CONTESTS = {
+    ("president", 2020): Contest(
+        f"{_RESULTS}/2020/20201103General%20Election/00000100000Citywide%20President%20Vice%20President%20Citywide%20EDLevel.csv",
+        [11, 12, 20, 21],
+    ),
+    ("president", 2016): Contest(
+        f"{_RESULTS}/2016/20161108General%20Election/00000100000Citywide%20President%20Vice%20President%20Citywide%20EDLevel.csv",
+        [0, 1, 9, 10],
+    ),
+}
+
+# Unit names are "<candidate(s)> (<party line>)". Candidates are mapped to a
+# canonical name and party lines to their state codes; rows for anyone not
+# listed (write-ins, blank/void tallies...) are dropped as they're read.
+CANDIDATES = {
+    "Donald J. Trump / Michael R. Pence": "Trump",
+    "Joseph R. Biden / Kamala D. Harris": "Biden",
+    "Hillary Clinton / Tim Kaine": "Clinton",
+}
+
+PARTIES = {
+    "Democratic": "DEM",
+    "Republican": "REP",
+    "Conservative": "CON",
+    "Working Families": "WFP",
+    "Women's Equality": "WEP",
+    "Green": "GRE",
+    "Libertarian": "LBT",
+    "Independence": "IND",
+}
+
+UNIT_NAME = re.compile(r"^(.*?)\s*\(([^()]*)\)\s*$")
+
+CHUNKSIZE = 100000
+
+
+def aliases(units, candidates=None, parties=None, by="candidate"):
+    """
+    Map raw unit names to result columns: the canonical candidate, or with
+    by="line" "<candidate> <party code>" (e.g. "Trump CON"). Units that don't
+    match a known candidate map to None.
+    """
+    candidates = CANDIDATES if candidates is None else candidates
+    parties = PARTIES if parties is None else parties
+    columns = {}
+    for unit in units:
+        match = UNIT_NAME.match(unit)
+        name, line = match.groups() if match else (unit, "")
+        candidate = candidates.get(name)
+        if candidate is not None and by == "line":
+            candidate = f"{candidate} {parties.get(line, line)}"
+        columns[unit] = candidate
+    return columns
+
+
+def load(year, contest="president", by="candidate", candidates=None, parties=None):
+    """
+    Votes by election district for an NYC contest, as a Precinct column (see
+    common/precinct.py) and one integer column per candidate, or per candidate
+    and party line with by="line".
+
+    The csv is read in chunks; each chunk is cut down to the rows for known
+    candidates and added into per-ED totals, so the full file is never held
+    in memory as text.
+    """
+    source = CONTESTS[(contest, year)]
+    known = {}
+    keys, codes, votes = [], [], []
+    for chunk in pd.read_csv(
+        fetch(source.url),
+        header=None,
+        usecols=source.columns,
+        names=["AD", "ED", "Unit", "Votes"],
+        dtype=str,
+        chunksize=CHUNKSIZE,
+    ):
+        # Only look up unit names not seen in an earlier chunk
+        new = set(chunk["Unit"].dropna().unique()) - known.keys()
+        known.update(aliases(new, candidates, parties, by))
+        column = chunk["Unit"].map(known)
+        chunk = chunk[column.notna()]
+
+        keys.append(precinct.encode(chunk["AD"].astype(int), chunk["ED"].astype(int)))
+        codes.append(column[column.notna()])
+        votes.append(
+            pd.to_numeric(chunk["Votes"].str.replace(",", ""), errors="coerce")
+            .fillna(0)
+            .to_numpy(dtype=np.int64)
+        )
+
+    keys = np.concatenate(keys)
+    codes = pd.Categorical(np.concatenate(codes))
+    eds, rows = np.unique(keys, return_inverse=True)
+
+    grid = np.zeros((len(eds), len(codes.categories)), dtype=np.int64)
+    np.add.at(grid, (rows, codes.codes), np.concatenate(votes))
+    df = pd.DataFrame(grid, columns=list(codes.categories))
+    df.insert(0, "Precinct", eds)
+    return df
@@ -0,0 +1,202 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import geo, schedule
+
+# States that give an electoral vote to the winner of each congressional
+# district, and their two at-large votes to the statewide winner
+SPLIT = ["ME", "NE"]
+
+# Scenarios drawn and scored together, and the unit of work per process
+CHUNK = 100_000
+
+
+def units(year=2020):
+    """
+    The units electoral votes are won in for an election year: every state
+    and DC, plus Maine's and Nebraska's districts (labelled like "NE-02"),
+    as a DataFrame of state and evs indexed by unit.
+    """
+    evs = geo.electoral_votes(year)
+    seats = geo.seats(year)
+    rows = []
+    for state, ev in evs.items():
+        if state in SPLIT:
+            rows.append((state, state, 2))
+            rows += [(f"{state}-{d:02d}", state, 1) for d in range(1, seats[state] + 1)]
+        else:
+            rows.append((state, state, ev))
+    return pd.DataFrame(rows, columns=["unit", "state", "evs"]).set_index("unit")
+
+
+def covariance(units, national=3.0, regional=2.0, state=3.0, district=2.0):
+    """
+    Covariance of the errors in every unit's margin, in points: a national
+    error shared by all, one per census region, one per state (shared by a
+    state's districts) and an extra independent one for each district.
+    """
+    region = geo.lookup(units["state"], "region")
+    states = units["state"].to_numpy()
+    is_district = units.index.to_numpy() != states
+    return (
+        national**2
+        + regional**2 * (region[:, None] == region[None, :])
+        + state**2 * (states[:, None] == states[None, :])
+        + district**2 * np.diag(is_district)
+    )
+
+
+class Simulation:
+    """
+    Tallies from simulated elections: how often the Democrat finished on each
+    electoral vote total, and for each unit how often the Democrat won it and
+    how often it was the tipping point.
+    """
+
+    def __init__(self, units, margins, histogram, wins, tipping):
+        self.units = units
+        self.margins = margins
+        self.histogram = histogram
+        self.wins = wins
+        self.tipping = tipping
+        self.simulations = int(histogram.sum())
+
+    def distribution(self):
+        """Probability of each Democratic electoral vote total."""
+        return pd.Series(
+            self.histogram / self.simulations, name="probability"
+        ).rename_axis("democrat")
+
+    def probabilities(self):
+        """Probability of a Democratic win, a Republican win and a tie."""
+        majority = self.units["evs"].sum() // 2 + 1
+        p = self.distribution()
+        return {
+            "democrat": float(p.iloc[majority:].sum()),
+            "republican": float(p.iloc[: len(p) - majority].sum()),
+            "tie": float(p.iloc[len(p) - majority : majority].sum()),
+        }
+
+    def table(self):
+        """
+        Per unit: electoral votes, expected margin, probability the Democrat
+        wins it and probability it's the tipping point (the unit that takes
+        the winner past a majority, going from their best result down).
+        """
+        df = self.units.copy()
+        df["margin"] = self.margins
+        df["democrat"] = self.wins / self.simulations
+        df["tipping"] = self.tipping / self.simulations
+        return df
+
+
+def _chunk(margins, factor, evs, size, seed):
+    rng = np.random.default_rng(seed)
+    total = int(evs.sum())
+    majority = total // 2 + 1
+    draws = margins + rng.standard_normal((size, len(evs)), np.float32) @ factor.T
+    won = draws > 0
+    # Totals are exact in float32 and the product is then a BLAS call
+    democrat = (won @ evs.astype(np.float32)).astype(np.int64)
+    histogram = np.bincount(democrat, minlength=total + 1)
+
+    # Rank units from the winner's best to worst; the tipping point is where
+    # their running total reaches a majority. Ties have none.
+    side = np.where(democrat >= majority, 1, 0) - np.where(
+        total - democrat >= majority, 1, 0
+    )
+    decided = side != 0
+    order = np.argsort(-draws[decided] * side[decided, None], axis=1)
+    running = np.cumsum(evs.astype(np.int16)[order], axis=1, dtype=np.int16)
+    tip = order[np.arange(len(order)), (running < majority).sum(axis=1)]
+    return histogram, won.sum(axis=0), np.bincount(tip, minlength=len(evs))
+
+
+def simulate(
+    margins,
+    year=2020,
+    simulations=1_000_000,
+    national=3.0,
+    regional=2.0,
+    state=3.0,
+    district=2.0,
+    seed=0,
+    jobs=None,
+):
+    """
+    Simulate elections from expected Democratic margins (in points, Democratic
+    minus Republican share) given as a Series indexed by unit - states by
+    postal code, and optionally districts like "ME-02", which otherwise take
+    their state's margin. Errors are drawn jointly from covariance() with the
+    given standard deviations.
+
+    Scenarios are drawn CHUNK at a time as one matrix of correlated errors and
+    scored together, with the chunks spread over jobs processes (default: one
+    per core). Each chunk has its own seed, so results don't depend on jobs.
+    """
+    table = units(year)
+    expected = pd.Series(table.index.map(margins), index=table.index, dtype=float)
+    expected = expected.fillna(table["state"].map(margins))
+    if expected.isna().any():
+        raise ValueError(f"no margin for {', '.join(expected.index[expected.isna()])}")
+
+    expected = expected.to_numpy(dtype=np.float32)
+    cov = covariance(table, national, regional, state, district)
+    factor = np.linalg.cholesky(cov).astype(np.float32)
+    evs = table["evs"].to_numpy(dtype=np.int32)
+
+    sizes = [min(CHUNK, simulations - i) for i in range(0, simulations, CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    results = schedule.starmap(
+        _chunk, [(expected, factor, evs, n, s) for n, s in zip(sizes, seeds)], jobs
+    )
+    histogram, wins, tipping = (sum(parts) for parts in zip(*results))
+    return Simulation(table, expected, histogram, wins, tipping)
+
+
+# ----- Benchmark: python -m common.electoral [simulations] -----
+
+
+def _simulate_loop(margins, factor, evs, simulations, seed=0):
+    # One scenario at a time
+    rng = np.random.default_rng(seed)
+    majority = evs.sum() // 2 + 1
+    wins, tipping = 0, np.zeros(len(evs), dtype=np.int64)
+    for _ in range(simulations):
+        draws = margins + factor @ rng.standard_normal(len(evs))
+        won = evs[draws > 0].sum() >= majority
+        wins += won
+        order = np.argsort(-draws if won else draws)
+        tipping[order[np.searchsorted(np.cumsum(evs[order]), majority)]] += 1
+    return wins / simulations
+
+
+if __name__ == "__main__":
+    simulations = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    table = units(2020)
+    # Random margins, with a fair number of close units
+    rng = np.random.default_rng(0)
+    margins = pd.Series(rng.normal(0, 15, len(table)), index=table.index)
+
+    loop = 20_000
+    cov = covariance(table)
+    start = time.perf_counter()
+    p_loop = _simulate_loop(
+        margins.to_numpy(), np.linalg.cholesky(cov), table["evs"].to_numpy(), loop
+    )
+    t_loop = (time.perf_counter() - start) * simulations / loop
+    print(f"loop: P(D) {p_loop:.3f}, ~{t_loop:.0f}s for {simulations} (timed {loop})")
+
+    start = time.perf_counter()
+    result = simulate(margins, simulations=simulations)
+    t_sim = time.perf_counter() - start
+    p = result.probabilities()
+    tipping = result.table()["tipping"].nlargest(3).round(3).to_dict()
+    print(
+        f"{simulations} simulations, {schedule.default_jobs()} jobs: "
+        f"{t_sim:.1f}s ({t_loop / t_sim:.0f}x), P(D) {p['democrat']:.3f}, "
+        f"tie {p['tie']:.4f}, top tipping points {tipping}"
+    )
@@ -0,0 +1,168 @@
+import re
+import sys
+import time
+from array import array
+from html.parser import HTMLParser
+
+import numpy as np
+import pandas as pd
+
+from .fetch import fetch
+
+# Rows of the results table start with the election district, e.g. "ED 001"
+ED_ROW = re.compile(r"^ED\s+(\d+)")
+
+
+class _Done(Exception):
+    pass
+
+
+class _TableParser(HTMLParser):
+    """
+    Collects the rows of the first table holding ED rows and stops as soon as
+    that table closes, rather than building every table on the page.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # One [rows] per open table; ENR pages nest tables for layout
+        self.tables = []
+        self.row = self.cell = None
+        self.result = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.tables.append([])
+        elif tag == "tr" and self.tables:
+            self.row = []
+            self.tables[-1].append(self.row)
+        elif tag in ("td", "th") and self.row is not None:
+            span = dict(attrs).get("colspan") or "1"
+            self.cell = [[], int(span) if span.isdigit() else 1]
+            self.row.append(self.cell)
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th"):
+            self.cell = None
+        elif tag == "tr":
+            self.row = self.cell = None
+        elif tag == "table" and self.tables:
+            rows = self.tables.pop()
+            if any(r and ED_ROW.match(_text(r[0])) for r in rows):
+                self.result = rows
+                raise _Done
+            self.row = self.cell = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell[0].append(data)
+
+
+def _text(cell):
+    return " ".join("".join(cell[0]).split())
+
+
+def _count(text):
+    text = text.replace(",", "")
+    return int(text) if text.isdigit() else 0
+
+
+class Table:
+    """
+    An ENR results table: the candidates' headers, the election district of
+    each row and a rows x candidates array of votes.
+    """
+
+    def __init__(self, candidates, eds, votes):
+        self.candidates = candidates
+        self.eds = eds
+        self.votes = votes
+
+    def frame(self, names=None, **columns):
+        """
+        The table as a DataFrame with an ed column, any constant columns given
+        (e.g. ad=23), and one column per candidate - named after their header,
+        or by names, which must list every candidate in order.
+        """
+        if names is None:
+            names = self.candidates
+        elif len(names) != len(self.candidates):
+            raise ValueError(
+                f"got {len(names)} names for candidates {self.candidates}"
+            )
+        df = pd.DataFrame(self.votes, columns=list(names))
+        df.insert(0, "ed", self.eds)
+        for i, (name, value) in enumerate(columns.items()):
+            df.insert(i, name, value)
+        return df
+
+
+def read(path):
+    """
+    Parse the results table of a saved ENR page into a Table.
+
+    Candidates are found from the header: each one's cell spans two columns,
+    their votes and their percentage, so the vote columns are wherever such a
+    cell starts. Only the HTML up to the end of the results table is parsed.
+    """
+    parser = _TableParser()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        try:
+            for chunk in iter(lambda: f.read(1 << 16), ""):
+                parser.feed(chunk)
+        except _Done:
+            pass
+    if parser.result is None:
+        raise ValueError(f"{path}: no results table")
+
+    candidates, columns = [], []
+    eds, votes = array("q"), array("q")
+    for row in parser.result:
+        first = _text(row[0]) if row else ""
+        if match := ED_ROW.match(first):
+            # Expand colspans so cells line up with the header columns
+            texts = [t for cell in row for t in [_text(cell)] * cell[1]]
+            eds.append(int(match.group(1)))
+            votes.extend(_count(texts[c]) if c < len(texts) else 0 for c in columns)
+        elif not columns and any(cell[1] == 2 for cell in row):
+            position = 0
+            for cell in row:
+                if cell[1] == 2:
+                    candidates.append(_text(cell))
+                    columns.append(position)
+                position += cell[1]
+
+    votes = np.frombuffer(votes, dtype=np.int64).reshape(-1, len(columns))
+    return Table(candidates, np.frombuffer(eds, dtype=np.int64), votes)
+
+
+# ----- Benchmark: python -m common.enr [saved pages...] -----
+
+
+def _read_html(path):
+    # What 66090 used to do: build every table, then take the third
+    df = pd.read_html(path)[2]
+    df = df[2:-1]
+    ed = df[0].apply(lambda x: int(x.split()[1]))
+    return ed, df[list(range(3, len(df.columns), 2))]
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [
+        fetch(f"https://web.enrboenyc.us/CD24306AD{ad}0.html") for ad in range(23, 33)
+    ]
+
+    start = time.perf_counter()
+    old = [_read_html(p) for p in paths]
+    t_old = time.perf_counter() - start
+    start = time.perf_counter()
+    new = [read(p) for p in paths]
+    t_new = time.perf_counter() - start
+
+    for (ed, votes), table in zip(old, new):
+        assert (ed.to_numpy() == table.eds).all()
+        assert (votes.to_numpy(dtype=np.int64) == table.votes).all()
+    print(
+        f"{len(paths)} pages, {sum(len(t.eds) for t in new)} rows: "
+        f"read_html {t_old:.2f}s, enr.read {t_new:.2f}s ({t_old / t_new:.1f}x)"
+    )
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Downloads are kept in questions/.cache/http unless SE_CACHE_DIR says otherwise.
+# Bodies live in objects/ named by their sha256, and index/ holds one small json
+# file per URL pointing at the current body along with its ETag/Last-Modified.
+CACHE_DIR = Path(
+    os.environ.get("SE_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache")
+)
+
+# Set SE_OFFLINE=1 to never touch the network - anything not cached is an error.
+OFFLINE = os.environ.get("SE_OFFLINE", "") not in ("", "0")
+
+DAY = 24 * 60 * 60
+
+# Seconds a cached copy is trusted before revalidating, matched on URL prefix.
+# Archived results don't change, live sheets can change every few minutes.
+SOURCES = {
+    "https://feeds-elections.foxnews.com/archive/": None,
+    "https://dataverse.harvard.edu/api/access/datafile/": None,
+    "https://static01.nyt.com/elections-assets/": 7 * DAY,
+    "https://uselectionatlas.org/": 30 * DAY,
+    "https://fivethirtyeight.com/": 30 * DAY,
+    "https://vote.nyc/": 30 * DAY,
+    "https://www2.census.gov/geo/docs/reference/": None,
+    "https://web.enrboenyc.us/": 30 * DAY,
+    "https://docs.google.com/spreadsheets/": 60 * 60,
+}
+
+DEFAULT_TTL = DAY
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/87.0.4280.66 Safari/537.36"
+)
+
+
+class NotCachedError(Exception):
+    pass
+
+
+def ttl_for(url):
+    """Cache lifetime for url in seconds, None meaning it never goes stale."""
+    matches = [prefix for prefix in SOURCES if url.startswith(prefix)]
+    if not matches:
+        return DEFAULT_TTL
+    return SOURCES[max(matches, key=len)]
+
+
+def _key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def _index_path(url):
+    return CACHE_DIR / "http" / "index" / f"{_key(url)}.json"
+
+
+def _object_path(digest):
+    return CACHE_DIR / "http" / "objects" / digest[:2] / digest
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _read_entry(url):
+    try:
+        with open(_index_path(url)) as f:
+            entry = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not _object_path(entry["sha256"]).exists():
+        return None
+    return entry
+
+
+def _write_entry(entry):
+    _write_atomic(_index_path(entry["url"]), json.dumps(entry, indent=1).encode())
+
+
+def _is_fresh(entry, ttl):
+    return ttl is None or time.time() - entry["fetched_at"] < ttl
+
+
+def cached(url, ttl=..., offline=None):
+    """
+    The path of url's cached copy if fetch() would return it without touching
+    the network (it's younger than ttl, or offline mode is on), else None.
+    """
+    if ttl is ...:
+        ttl = ttl_for(url)
+    if offline is None:
+        offline = OFFLINE
+    entry = _read_entry(url)
+    if entry is not None and (offline or _is_fresh(entry, ttl)):
+        return _object_path(entry["sha256"])
+    return None
+
+
+def fetch(url, ttl=..., headers=None, offline=None):
+    """
+    Return the path of a local copy of url, downloading it only if needed.
+
+    A cached copy younger than ttl (default: looked up in SOURCES) is used as is.
+    An older one is revalidated with If-None-Match/If-Modified-Since, so an
+    unchanged file costs a 304 rather than a full download. In offline mode the
+    cached copy is returned whatever its age.
+    """
+    if ttl is ...:
+        ttl = ttl_for(url)
+    if offline is None:
+        offline = OFFLINE
+
+    entry = _read_entry(url)
+    if entry is not None and (offline or _is_fresh(entry, ttl)):
+        return _object_path(entry["sha256"])
+    if offline:
+        raise NotCachedError(f"{url} is not in the cache and offline mode is on")
+
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    for k, v in (headers or {}).items():
+        req.add_header(k, v)
+    if entry is not None:
+        if entry.get("etag"):
+            req.add_header("If-None-Match", entry["etag"])
+        if entry.get("last_modified"):
+            req.add_header("If-Modified-Since", entry["last_modified"])
+
+    try:
+        with urllib.request.urlopen(req) as response:
+            body = response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code != 304 or entry is None:
+            raise
+        entry["fetched_at"] = time.time()
+        _write_entry(entry)
+        return _object_path(entry["sha256"])
+
+    digest = hashlib.sha256(body).hexdigest()
+    path = _object_path(digest)
+    if not path.exists():
+        _write_atomic(path, body)
+    _write_entry(
+        {
+            "url": url,
+            "host": urlsplit(url).netloc,
+            "sha256": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+    )
+    return path
+
+
+def fetch_bytes(url, **kwargs):
+    return fetch(url, **kwargs).read_bytes()
+
+
+def fetch_json(url, **kwargs):
+    with open(fetch(url, **kwargs)) as f:
+        return json.load(f)
@@ -0,0 +1,240 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .fetch import fetch
+
+# State FIPS, postal code, name and House seats apportioned by each census
+_STATES = [
+    # fips, abbr, name, 1990, 2000, 2010, 2020
+    (1, "AL", "Alabama", 7, 7, 7, 7),
+    (2, "AK", "Alaska", 1, 1, 1, 1),
+    (4, "AZ", "Arizona", 6, 8, 9, 9),
+    (5, "AR", "Arkansas", 4, 4, 4, 4),
+    (6, "CA", "California", 52, 53, 53, 52),
+    (8, "CO", "Colorado", 6, 7, 7, 8),
+    (9, "CT", "Connecticut", 6, 5, 5, 5),
+    (10, "DE", "Delaware", 1, 1, 1, 1),
+    (11, "DC", "District of Columbia", 0, 0, 0, 0),
+    (12, "FL", "Florida", 23, 25, 27, 28),
+    (13, "GA", "Georgia", 11, 13, 14, 14),
+    (15, "HI", "Hawaii", 2, 2, 2, 2),
+    (16, "ID", "Idaho", 2, 2, 2, 2),
+    (17, "IL", "Illinois", 20, 19, 18, 17),
+    (18, "IN", "Indiana", 10, 9, 9, 9),
+    (19, "IA", "Iowa", 5, 5, 4, 4),
+    (20, "KS", "Kansas", 4, 4, 4, 4),
+    (21, "KY", "Kentucky", 6, 6, 6, 6),
+    (22, "LA", "Louisiana", 7, 7, 6, 6),
+    (23, "ME", "Maine", 2, 2, 2, 2),
+    (24, "MD", "Maryland", 8, 8, 8, 8),
+    (25, "MA", "Massachusetts", 10, 10, 9, 9),
+    (26, "MI", "Michigan", 16, 15, 14, 13),
+    (27, "MN", "Minnesota", 8, 8, 8, 8),
+    (28, "MS", "Mississippi", 5, 4, 4, 4),
+    (29, "MO", "Missouri", 9, 9, 8, 8),
+    (30, "MT", "Montana", 1, 1, 1, 2),
+    (31, "NE", "Nebraska", 3, 3, 3, 3),
+    (32, "NV", "Nevada", 2, 3, 4, 4),
+    (33, "NH", "New Hampshire", 2, 2, 2, 2),
+    (34, "NJ", "New Jersey", 13, 13, 12, 12),
+    (35, "NM", "New Mexico", 3, 3, 3, 3),
+    (36, "NY", "New York", 31, 29, 27, 26),
+    (37, "NC", "North Carolina", 12, 13, 13, 14),
+    (38, "ND", "North Dakota", 1, 1, 1, 1),
+    (39, "OH", "Ohio", 19, 18, 16, 15),
+    (40, "OK", "Oklahoma", 6, 5, 5, 5),
+    (41, "OR", "Oregon", 5, 5, 5, 6),
+    (42, "PA", "Pennsylvania", 21, 19, 18, 17),
+    (44, "RI", "Rhode Island", 2, 2, 2, 2),
+    (45, "SC", "South Carolina", 6, 6, 7, 7),
+    (46, "SD", "South Dakota", 1, 1, 1, 1),
+    (47, "TN", "Tennessee", 9, 9, 9, 9),
+    (48, "TX", "Texas", 30, 32, 36, 38),
+    (49, "UT", "Utah", 3, 3, 4, 4),
+    (50, "VT", "Vermont", 1, 1, 1, 1),
+    (51, "VA", "Virginia", 11, 11, 11, 11),
+    (53, "WA", "Washington", 9, 9, 10, 10),
+    (54, "WV", "West Virginia", 3, 3, 3, 2),
+    (55, "WI", "Wisconsin", 9, 8, 8, 8),
+    (56, "WY", "Wyoming", 1, 1, 1, 1),
+    (72, "PR", "Puerto Rico", 0, 0, 0, 0),
+]
+
+CENSUSES = [1990, 2000, 2010, 2020]
+
+# Census regions
+REGIONS = {
+    "Northeast": "CT ME MA NH RI VT NJ NY PA".split(),
+    "Midwest": "IL IN MI OH WI IA KS MN MO NE ND SD".split(),
+    "South": "DE DC FL GA MD NC SC VA WV AL KY MS TN AR LA OK TX".split(),
+    "West": "AZ CO ID MT NV NM UT WY AK CA HI OR WA".split(),
+}
+
+STATES = pd.DataFrame(
+    [row[:3] for row in _STATES], columns=["fips", "abbr", "name"]
+).astype({"fips": np.int64})
+STATES["region"] = STATES["abbr"].map(
+    {abbr: region for region, members in REGIONS.items() for abbr in members}
+)
+
+# House seats, states x censuses
+SEATS = pd.DataFrame(
+    [row[3:] for row in _STATES], index=STATES["abbr"], columns=CENSUSES
+)
+
+COUNTIES = "https://www2.census.gov/geo/docs/reference/codes2020/national_county2020.txt"
+
+
+def _keys():
+    # Every accepted spelling of each state -> its row in STATES
+    keys = {}
+    columns = zip(STATES["fips"], STATES["abbr"], STATES["name"])
+    for row, (fips, abbr, name) in enumerate(columns):
+        for key in (fips, abbr.lower(), name.lower()):
+            keys[key] = row
+    return keys
+
+
+_KEYS = _keys()
+
+
+def _key(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return int(value) if value.isdigit() else value.lower()
+    return int(value)
+
+
+def rows(values):
+    """
+    The STATES row of each value, given as FIPS (int or string, padded or not),
+    postal code or name in any case, or -1 where it's none of those.
+
+    Each distinct value is looked up once, however many times it occurs, and
+    the rows are then gathered in one go.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    found = np.array([_KEYS.get(_key(u), -1) for u in uniques] + [-1], dtype=np.int64)
+    # codes are -1 for missing values, which picks the trailing -1
+    return found[codes]
+
+
+def lookup(values, field="abbr"):
+    """
+    Map states given in any form rows() accepts to a STATES column ("fips",
+    "abbr", "name" or "region"). Unrecognised or missing values come back as
+    None, or -1 for fips.
+    """
+    column = STATES[field].to_numpy()
+    missing = -1 if field == "fips" else None
+    return np.append(column, np.array([missing], dtype=column.dtype))[rows(values)]
+
+
+def fips(values, width=5):
+    """
+    FIPS codes as zero-padded strings, e.g. 1001 -> "01001", from ints, floats
+    or unpadded strings; missing values stay None. Use width=2 for states.
+    """
+    values = pd.Series(np.asarray(values))
+    if pd.api.types.is_numeric_dtype(values):
+        values = values.astype("Int64")
+    codes, uniques = pd.factorize(values.astype(str).where(values.notna()))
+    padded = np.char.zfill(np.asarray(uniques, dtype=str), width)
+    return np.append(padded.astype(object), None)[codes]
+
+
+def cd_codes(states, seats):
+    """
+    Congressional district codes, state FIPS * 100 + seat (so NY-03 is 3603),
+    as an Int32 array, from states in any form rows() accepts and their seat
+    numbers. Unrecognised states or seats give NA.
+    """
+    state = lookup(states, "fips")
+    seat = pd.to_numeric(pd.Series(np.asarray(seats)), errors="coerce").to_numpy(float)
+    return pd.array(np.where(state < 0, np.nan, state * 100 + seat), dtype="Int32")
+
+
+def parse_cds(labels):
+    """cd_codes() for labels like "NY-03", parsing each distinct label once."""
+    codes, uniques = pd.factorize(np.asarray(labels, dtype=object))
+    parts = pd.Series(uniques, dtype=object).str.extract(r"^\s*(\w+)-(\d+)\s*$")
+    # codes are -1 for missing values, which take() fills with NA
+    return cd_codes(parts[0], parts[1]).take(codes, allow_fill=True)
+
+
+def cd_labels(codes):
+    """
+    Labels like "NY-03" for cd_codes(), formatting each distinct code once;
+    NA gives None. Meant for output, with the codes used everywhere else.
+    """
+    codes, uniques = pd.factorize(pd.array(codes, dtype="Int32"))
+    uniques = uniques.to_numpy(np.int64)
+    states = lookup(uniques // 100)
+    labels = [f"{state}-{seat:02d}" for state, seat in zip(states, uniques % 100)]
+    return np.append(np.array(labels, dtype=object), None)[codes]
+
+
+def census(year):
+    """The census whose apportionment applies to elections held in year."""
+    value = (year - 2) // 10 * 10
+    if value not in CENSUSES:
+        raise ValueError(f"no apportionment for {year}, only {CENSUSES[0] + 2} on")
+    return value
+
+
+def seats(year):
+    """House seats by state postal code for elections in year."""
+    return SEATS[census(year)].drop("PR")
+
+
+def electoral_votes(year):
+    """Electoral votes by state postal code (DC included) for elections in year."""
+    evs = seats(year) + 2
+    evs["DC"] = 3
+    return evs
+
+
+def counties(url=COUNTIES):
+    """
+    Every county and county equivalent, as a DataFrame of zero-padded FIPS,
+    state postal code and name, indexed by FIPS.
+    """
+    df = pd.read_csv(fetch(url), sep="|", dtype=str, encoding="latin-1")
+    return pd.DataFrame(
+        {
+            "FIPS": df["STATEFP"] + df["COUNTYFP"],
+            "state": df["STATE"],
+            "name": df["COUNTYNAME"],
+        }
+    ).set_index("FIPS", drop=False)
+
+
+# ----- Benchmark: python -m common.geo [rows] -----
+
+
+def _lookup_rowwise(values):
+    # Per-row, as the question scripts used to do it
+    by_name = dict(zip(STATES["name"], STATES["abbr"]))
+    return pd.Series(values).apply(lambda x: by_name[x])
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    values = STATES["name"].to_numpy()[rng.integers(0, len(STATES), n)]
+
+    start = time.perf_counter()
+    old = _lookup_rowwise(values)
+    t_old = time.perf_counter() - start
+    start = time.perf_counter()
+    new = lookup(values)
+    t_new = time.perf_counter() - start
+
+    assert (old.to_numpy() == new).all()
+    print(
+        f"{n} rows: apply {t_old:.2f}s, geo.lookup {t_new:.3f}s "
+        f"({t_old / t_new:.0f}x)"
+    )
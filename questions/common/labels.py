@@ -0,0 +1,235 @@
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties, findfont, get_font
+from matplotlib.ft2font import Kerning, LoadFlags
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+
+# Label positions tried, in order, for a label that overlaps another, in
+# multiples of the label's own width and height.
+NUDGES = [
+    (0, 0),
+    (0, 1),
+    (0, -1),
+    (1, 0),
+    (-1, 0),
+    (1, 1),
+    (-1, 1),
+    (1, -1),
+    (-1, -1),
+]
+
+# Glyph outlines are built once at this size, in points, and scaled to fit
+GLYPH_SIZE = 100
+
+
+def anchors(gdf):
+    """Centroids of every feature as an (n, 2) array."""
+    centroids = gdf.geometry.centroid
+    return np.column_stack([centroids.x.to_numpy(), centroids.y.to_numpy()])
+
+
+def _font():
+    font = get_font(findfont(FontProperties()))
+    font.set_size(GLYPH_SIZE, 72)
+    return font
+
+
+@lru_cache(maxsize=None)
+def _glyph(char):
+    # A character's outline at GLYPH_SIZE with its origin on the baseline, its
+    # advance and its glyph index, looked up once per character
+    vertices, codes = np.zeros((0, 2)), np.zeros(0, dtype=Path.code_type)
+    if not char.isspace():
+        path = TextPath((0, 0), char, size=GLYPH_SIZE)
+        vertices, codes = path.vertices, path.codes
+    font = _font()
+    advance = font.load_char(ord(char), flags=LoadFlags.NO_HINTING).linearHoriAdvance
+    return vertices, codes, advance / 65536, font.get_char_index(ord(char))
+
+
+@lru_cache(maxsize=None)
+def _kerning(left, right):
+    return _font().get_kerning(left, right, Kerning.UNFITTED) / 64
+
+
+@lru_cache(maxsize=4096)
+def _line(line):
+    # The cached glyphs set along a baseline with their advances and kerning,
+    # as TextPath would (less ligatures), centred horizontally on x = 0
+    vertices, codes = [], []
+    x, previous = 0.0, None
+    for char in line:
+        glyph, glyph_codes, advance, index = _glyph(char)
+        if previous is not None:
+            x += _kerning(previous, index)
+        vertices.append(glyph + (x, 0))
+        codes.append(glyph_codes)
+        x += advance
+        previous = index
+    vertices = np.concatenate(vertices) if vertices else np.zeros((0, 2))
+    if len(vertices):
+        vertices[:, 0] -= (vertices[:, 0].min() + vertices[:, 0].max()) / 2
+    return vertices, np.concatenate(codes) if codes else np.zeros(0, Path.code_type)
+
+
+def _text_path(text, fontsize):
+    # Lines are stacked ourselves, each centred horizontally with the block
+    # centred on (0, 0). Glyphs are cached per character, so a label costs a
+    # few array copies rather than a font layout.
+    lines = text.split("\n")
+    step = GLYPH_SIZE * 1.2
+    vertices, codes = [], []
+    for i, line in enumerate(lines):
+        line_vertices, line_codes = _line(line)
+        dy = (len(lines) - 1) * step / 2 - i * step - GLYPH_SIZE * 0.35
+        vertices.append(line_vertices + (0, dy))
+        codes.append(line_codes)
+    vertices = np.concatenate(vertices)
+    if not len(vertices):
+        return Path(np.zeros((1, 2)))
+    return Path(vertices * (fontsize / GLYPH_SIZE), np.concatenate(codes))
+
+
+def _data_per_point(ax):
+    ax.apply_aspect()
+    (x0, y0), (x1, y1) = ax.transData.transform([(0, 0), (1, 1)])
+    points_per_pixel = 72 / ax.figure.dpi
+    return (
+        1 / abs((x1 - x0) * points_per_pixel),
+        1 / abs((y1 - y0) * points_per_pixel),
+    )
+
+
+def _overlapping(a, b):
+    # Whether boxes (x0, y0, x1, y1) overlap, broadcasting over leading axes
+    return (
+        (a[..., 0] < b[..., 2])
+        & (b[..., 0] < a[..., 2])
+        & (a[..., 1] < b[..., 3])
+        & (b[..., 1] < a[..., 3])
+    )
+
+
+def place(xy, sizes, priority=None):
+    """
+    Move overlapping labels to a nearby free spot, returning their new centres
+    and whether each one found a spot.
+
+    xy are the label centres and sizes their (width, height), both in data units.
+    All boxes go into an STRtree at once to find which labels collide at all;
+    only those are then placed one by one, highest priority first (feature
+    order if not given), at the first of NUDGES that doesn't overlap anything
+    already placed. A label with no free spot is left at its anchor and marked
+    as not placed.
+    """
+    n = len(xy)
+    half = sizes / 2
+    boxes = np.hstack([xy - half, xy + half])
+    tree = shapely.STRtree(shapely.box(*boxes.T))
+    left, right = tree.query(shapely.box(*boxes.T), predicate="intersects")
+    colliding = np.zeros(n, dtype=bool)
+    colliding[left[left != right]] = True
+
+    # Every spot a label can take lies within its box grown by its own size on
+    # each side, so only labels whose grown boxes meet can get in each other's
+    # way. Finding those pairs is one more bulk query.
+    grown = shapely.box(*np.hstack([xy - 3 * half, xy + 3 * half]).T)
+    left, right = shapely.STRtree(grown).query(grown, predicate="intersects")
+    starts = np.searchsorted(left, np.arange(n + 1))
+
+    # Boxes taken so far: labels that don't collide keep their spot, the rest
+    # take one as they're placed (NaN never overlaps anything)
+    taken = np.where(colliding[:, None], np.nan, boxes)
+    nudges = np.array(NUDGES)
+    out = xy.copy()
+    placed = ~colliding
+
+    order = np.flatnonzero(colliding)
+    if priority is not None:
+        order = order[np.argsort(-np.asarray(priority)[order], kind="stable")]
+
+    for i in order:
+        near = right[starts[i] : starts[i + 1]]
+        centres = xy[i] + nudges * sizes[i]
+        spots = np.hstack([centres - half[i], centres + half[i]])
+        blocked = _overlapping(spots[:, None], taken[near][None]).any(axis=1)
+        free = np.flatnonzero(~blocked)
+        if len(free):
+            out[i] = centres[free[0]]
+            taken[i] = spots[free[0]]
+            placed[i] = True
+    return out, placed
+
+
+def draw(
+    ax,
+    xy,
+    texts,
+    fontsize,
+    color="black",
+    stroke=None,
+    stroke_color="black",
+    priority=None,
+    avoid=True,
+    crowded="drop",
+):
+    """
+    Draw every label as a single collection, centred on xy (data coordinates).
+
+    Text is converted to paths sized in points, so it keeps its size whatever
+    the output DPI. `stroke` is an outline width in points, drawn underneath the
+    text like patheffects.withStroke. With avoid, overlapping labels are moved
+    apart using place(), and those with no free spot are left out, or drawn at
+    their anchor anyway with crowded="keep".
+
+    Returns the collections and a boolean array of which labels were drawn.
+    """
+    if crowded not in ("drop", "keep"):
+        raise ValueError(f"crowded must be 'drop' or 'keep', not {crowded!r}")
+    xy = np.asarray(xy, dtype=float)
+    paths = [_text_path(str(text), fontsize) for text in texts]
+    shown = np.ones(len(paths), dtype=bool)
+
+    if avoid and len(paths):
+        sx, sy = _data_per_point(ax)
+        extents = np.array([np.ptp(p.vertices, axis=0) for p in paths])
+        xy, placed = place(xy, extents * (sx, sy), priority)
+        if crowded == "drop":
+            shown = placed
+            paths = [p for p, keep in zip(paths, shown) if keep]
+            xy = xy[shown]
+
+    # Paths are in points; offsets are in data coordinates
+    points = Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans
+    collections = []
+    if stroke:
+        collections.append(
+            PathCollection(
+                paths,
+                offsets=xy,
+                offset_transform=ax.transData,
+                transform=points,
+                facecolor=stroke_color,
+                edgecolor=stroke_color,
+                linewidth=stroke,
+                joinstyle="round",
+            )
+        )
+    collections.append(
+        PathCollection(
+            paths,
+            offsets=xy,
+            offset_transform=ax.transData,
+            transform=points,
+            facecolor=color,
+            linewidth=0,
+        )
+    )
+    for collection in collections:
+        ax.add_collection(collection, autolim=False)
+    return collections, shown
@@ -0,0 +1,73 @@
+"""
+Polling feeds that change during a count, and a stub server to test against.
+
+    python -m common.live stub/ --seed URL...  # copy cached feeds into stub/
+    python -m common.live stub/                # serve them on localhost:8000
+
+Editing or replacing a file in the directory then looks to a poller like the
+feed updating.
+"""
+import argparse
+import functools
+import shutil
+import time
+import urllib.error
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .fetch import fetch
+
+
+def poll(urls, interval=30):
+    """
+    Yield a tuple of local paths for urls now, and again whenever any of them
+    changes, checking every interval seconds.
+
+    Each check is a conditional request (see fetch), so an unchanged feed
+    costs a 304. A failed check is reported and retried on the next one.
+    """
+    last = None
+    while True:
+        try:
+            paths = tuple(fetch(url, ttl=0) for url in urls)
+        except (urllib.error.URLError, OSError) as e:
+            print(f"poll failed, retrying in {interval}s: {e}")
+        else:
+            if paths != last:
+                last = paths
+                yield paths
+        time.sleep(interval)
+
+
+def name_for(url):
+    """The file a feed is served as by the stub server."""
+    return Path(urlsplit(url).path).name
+
+
+def seed(directory, urls):
+    """Copy the current version of each url into directory, named by name_for."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for url in urls:
+        shutil.copyfile(fetch(url), directory / name_for(url))
+
+
+def serve(directory, port=8000):
+    """Serve directory on localhost, with Last-Modified/If-Modified-Since."""
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(directory))
+    with ThreadingHTTPServer(("localhost", port), handler) as server:
+        print(f"serving {directory} at http://localhost:{port}/")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub server for feeds.")
+    parser.add_argument("directory")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--seed", nargs="+", metavar="URL", help="copy feeds in")
+    args = parser.parse_args()
+    if args.seed:
+        seed(args.directory, args.seed)
+    else:
+        serve(args.directory, args.port)
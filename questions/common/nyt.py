@@ -0,0 +1,250 @@
+import json
+import os
+import re
+import tempfile
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from . import geo
+from .fetch import CACHE_DIR, fetch
+
+HOUSE = "https://static01.nyt.com/elections-assets/2020/data/api/2020-11-03/national-map-page/national/house.json"
+
+# Bumped when the tables load() stores change, so old stores aren't read
+STORE_FORMAT = 2
+
+
+def iter_array(path, key, chunk_size=1 << 16):
+    """
+    Yield the items of the array stored under key in a json file, one at a time.
+
+    The file is read in chunks and each item decoded as soon as it's complete,
+    so only one item (plus a chunk) is ever held in memory however large the
+    feed. Items are expected to be objects or arrays, as races are.
+    """
+    decoder = json.JSONDecoder()
+    marker = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    with open(path, encoding="utf-8") as f:
+        buf = ""
+        while not (match := marker.search(buf)):
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise KeyError(key)
+            # Keep a tail in case the key straddles two chunks
+            buf = buf[-len(key) - 64 :] + chunk
+        buf, pos = buf[match.end() :], 0
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buf):
+                buf, pos = f.read(chunk_size), 0
+                if not buf:
+                    raise ValueError(f"{path}: unterminated array {key!r}")
+                continue
+            if buf[pos] == "]":
+                return
+
+            while True:
+                try:
+                    item, pos = decoder.raw_decode(buf, pos)
+                    break
+                except json.JSONDecodeError:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        raise
+                    buf, pos = buf[pos:] + chunk, 0
+            yield item
+
+
+def iter_races(url=HOUSE):
+    """Races from an NYT results feed, streamed."""
+    return iter_array(fetch(url), "races")
+
+
+class Totals:
+    """Votes summed by unit (state, county...) and party, units x parties."""
+
+    def __init__(self, units, parties, votes):
+        self.units = units
+        self.parties = parties
+        self.votes = votes
+
+    def frame(self):
+        return pd.DataFrame(self.votes, index=self.units, columns=self.parties)
+
+    def winners(self):
+        """The party with the most votes in each unit."""
+        winner = np.asarray(self.parties, dtype=object)[self.votes.argmax(axis=1)]
+        return pd.Series(winner, index=self.units, name="winner")
+
+
+def aggregate(races, by="state_id"):
+    """
+    Total every candidate's votes by race[by] and party in a single pass over
+    races, which can be any iterable (e.g. iter_races, so the feed is never
+    loaded whole).
+    """
+    units, parties = {}, {}
+    rows, columns, votes = array("q"), array("q"), array("q")
+    for race in races:
+        row = units.setdefault(race[by], len(units))
+        for candidate in race["candidates"]:
+            rows.append(row)
+            columns.append(parties.setdefault(candidate["party_id"], len(parties)))
+            votes.append(candidate["votes"] or 0)
+
+    grid = np.zeros((len(units), len(parties)), dtype=np.int64)
+    rows, columns, votes = (
+        np.frombuffer(a, dtype=np.int64) for a in (rows, columns, votes)
+    )
+    np.add.at(grid, (rows, columns), votes)
+    return Totals(list(units), list(parties), grid)
+
+
+class Results:
+    """
+    A feed's races and candidates as two flat, typed tables.
+
+    races has one row per race: state_id and leader_party_id as categoricals,
+    seat as an integer district number and cd as the district's geo.cd_codes()
+    code. candidates has one row per candidate: race (row number in races),
+    party_id as a categorical and votes.
+    """
+
+    def __init__(self, races, candidates):
+        self.races = races
+        self.candidates = candidates
+
+    def districts(self):
+        """
+        Congressional district labels like "NY-03", one per race. Join and group
+        on races["cd"] instead where possible, and label the result.
+        """
+        return pd.Series(
+            geo.cd_labels(self.races["cd"]), index=self.races.index, name="CD"
+        )
+
+    def totals(self, by="state_id"):
+        """Candidates' votes summed by a races column and party, as Totals."""
+        units = self.races[by].astype("category").cat
+        parties = self.candidates["party_id"].cat
+        race = self.candidates["race"].to_numpy()
+        grid = np.zeros((len(units.categories), len(parties.categories)), np.int64)
+        np.add.at(
+            grid,
+            (units.codes.to_numpy()[race], parties.codes.to_numpy()),
+            self.candidates["votes"].to_numpy(),
+        )
+        return Totals(list(units.categories), list(parties.categories), grid)
+
+
+def _flatten(races):
+    # One streaming pass into flat columns
+    state, seat, leader = [], array("q"), []
+    race, party, votes = array("q"), [], array("q")
+    for i, r in enumerate(races):
+        state.append(r["state_id"])
+        seat.append(int(r.get("seat") or 0))
+        leader.append(r.get("leader_party_id"))
+        for c in r["candidates"]:
+            race.append(i)
+            party.append(c["party_id"])
+            votes.append(c["votes"] or 0)
+
+    seat = np.frombuffer(seat, dtype=np.int64).astype(np.int16)
+    races = pd.DataFrame(
+        {
+            "state_id": pd.Categorical(state),
+            "seat": seat,
+            "cd": geo.cd_codes(state, seat),
+            "leader_party_id": pd.Categorical(leader),
+        }
+    )
+    candidates = pd.DataFrame(
+        {
+            "race": np.frombuffer(race, dtype=np.int64).astype(np.int32),
+            "party_id": pd.Categorical(party),
+            "votes": np.frombuffer(votes, dtype=np.int64),
+        }
+    )
+    return races, candidates
+
+
+def load(url=HOUSE):
+    """
+    The Results for a feed, flattened from the json once per version of the
+    feed and kept under .cache/nyt as parquet.
+    """
+    source = fetch(url)
+    directory = CACHE_DIR / "nyt" / f"v{STORE_FORMAT}" / source.name
+    if not directory.exists():
+        races, candidates = _flatten(iter_array(source, "races"))
+        tmp = directory.with_suffix(".tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+        races.to_parquet(tmp / "races.parquet", index=False)
+        candidates.to_parquet(tmp / "candidates.parquet", index=False)
+        os.replace(tmp, directory)
+    return Results(
+        pd.read_parquet(directory / "races.parquet"),
+        pd.read_parquet(directory / "candidates.parquet"),
+    )
+
+
+# ----- Benchmark: python -m common.nyt -----
+
+
+def _winners_rescan(data):
+    # The per-state rescan with summed Counters that 60728 used to run
+    return {
+        state: max(
+            parties := sum(
+                [
+                    Counter({c["party_id"]: c["votes"] for c in race["candidates"]})
+                    for race in data
+                    if race["state_id"] == state
+                ],
+                Counter(),
+            ),
+            key=parties.get,
+        )
+        for state in set(race["state_id"] for race in data)
+    }
+
+
+if __name__ == "__main__":
+    path = fetch(HOUSE)
+    with open(path) as f:
+        data = json.load(f)["data"]["races"]
+
+    start = time.perf_counter()
+    old = _winners_rescan(data)
+    t_old = time.perf_counter() - start
+    start = time.perf_counter()
+    new = aggregate(iter_races()).winners()
+    t_new = time.perf_counter() - start
+    load()
+    start = time.perf_counter()
+    cached = load().totals().winners()
+    t_cached = time.perf_counter() - start
+    assert new.to_dict() == cached.to_dict()
+    print(
+        f"house.json: rescan {t_old:.3f}s, streamed {t_new:.3f}s, "
+        f"from the store {t_cached:.3f}s"
+    )
+
+    # A feed 100x the size, e.g. every county's results for every office
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+        json.dump({"data": {"races": data * 100}}, f)
+        f.flush()
+        start = time.perf_counter()
+        totals = aggregate(iter_array(f.name, "races"))
+        t_big = time.perf_counter() - start
+    print(
+        f"{len(data) * 100} races streamed into {totals.votes.shape} totals: "
+        f"{t_big:.3f}s"
+    )
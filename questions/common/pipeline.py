@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+import types
+from pathlib import Path
+
+from . import render, schedule
+from .fetch import CACHE_DIR, fetch
+
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _common_module(obj):
+    # The file of a common.* module that obj is, or is defined in
+    name = obj.__name__ if isinstance(obj, types.ModuleType) else obj.__module__
+    if name and name.startswith("common."):
+        return sys.modules[name].__file__
+    return None
+
+
+def _is_constant(obj):
+    # Plain data whose repr is its value, like a script's LEGEND or TITLE
+    if isinstance(obj, (str, bytes, int, float, complex, bool, Path)):
+        return True
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        return all(_is_constant(v) for v in obj)
+    if isinstance(obj, dict):
+        return all(_is_constant(k) and _is_constant(v) for k, v in obj.items())
+    return False
+
+
+def code_hash(func):
+    """
+    Hash of a stage's source, plus the source of any functions from the same
+    script it calls, the values of the script's constants they read and the
+    files of any common modules it uses - so editing one stage doesn't
+    invalidate the others.
+    """
+    h = hashlib.sha256()
+    seen, files = set(), set()
+    todo = [func]
+    while todo:
+        f = todo.pop()
+        if f in seen:
+            continue
+        seen.add(f)
+        h.update(inspect.getsource(f).encode())
+        names = set(f.__code__.co_names)
+        for const in f.__code__.co_consts:
+            if isinstance(const, types.CodeType):
+                names.update(const.co_names)
+        for name in sorted(names):
+            obj = f.__globals__.get(name)
+            if obj is None:
+                continue
+            same_script = getattr(obj, "__module__", None) == func.__module__
+            if isinstance(obj, types.FunctionType) and same_script:
+                todo.append(obj)
+            elif isinstance(obj, (types.ModuleType, types.FunctionType, type)):
+                module_file = _common_module(obj)
+                if module_file:
+                    files.add(module_file)
+            elif _is_constant(obj):
+                h.update(f"{name}={obj!r}".encode())
+    for path in sorted(files):
+        h.update(_file_hash(path).encode())
+    return h.hexdigest()
+
+
+class MissingInput(Exception):
+    pass
+
+
+class Stage:
+    def __init__(self, func, inputs, outputs, sources, always, parallel):
+        self.func = func
+        self.name = func.__name__
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.sources = list(sources)
+        self.always = always
+        self.parallel = parallel
+
+    def key(self, extra):
+        h = hashlib.sha256(code_hash(self.func).encode())
+        for path in self.inputs:
+            if not path.exists():
+                raise MissingInput(f"missing input {path}")
+            h.update(f"{path}:{_file_hash(path)}".encode())
+        # fetch() keeps each download under its sha256, so the cached path
+        # changes exactly when the source does (once its TTL has run out)
+        for url in self.sources:
+            h.update(f"{url}:{fetch(url).name}".encode())
+        h.update(repr(extra).encode())
+        return h.hexdigest()
+
+
+class Pipeline:
+    """
+    A question script split into stages that are skipped when nothing they
+    depend on has changed.
+
+    Stages are declared in order with the files they read and write:
+
+        pipeline = Pipeline(__file__)
+
+        @pipeline.stage(inputs=["degree_data.csv"], outputs=["out_data.csv"])
+        def compute():
+            ...
+
+        @pipeline.stage(inputs=["out_data.csv"], outputs=["graph.png"])
+        def plot():
+            ...
+
+        pipeline.run()
+
+    A stage's key is a hash of its code and the constants it reads (see
+    code_hash), the contents of its inputs and the current version of any URLs
+    it lists as sources (fetched with their usual TTL). It's skipped if
+    the key matches the last successful run and all its outputs still exist,
+    so changing a plot title only reruns the plotting stage. Stages whose
+    downloads can't be listed up front (e.g. a crawl) can be declared
+    always=True to run every time, and stages that spread their own work over
+    processes (e.g. tiles.export) parallel=True, so they get every core rather
+    than one worker's share. Data shared between stages goes through files;
+    pipeline.path(name) gives a location under .cache for ones that aren't
+    worth committing.
+    """
+
+    def __init__(self, script):
+        self.dir = Path(script).resolve().parent
+        self.name = self.dir.name
+        self.stages = []
+
+    def path(self, name):
+        path = CACHE_DIR / "pipeline" / self.name / "data" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def stage(self, inputs=(), outputs=(), sources=(), always=False, parallel=False):
+        def decorator(func):
+            stage = Stage(func, inputs, outputs, sources, always, parallel)
+            self.stages.append(stage)
+            return func
+
+        return decorator
+
+    def _stamp(self, stage, variant):
+        return CACHE_DIR / "pipeline" / self.name / f"{stage.name}{variant}.json"
+
+    def _dependencies(self, stages):
+        made_by = {p.resolve(): s for s in stages for p in s.outputs}
+        return {
+            s: {made_by[p.resolve()] for p in s.inputs if p.resolve() in made_by} - {s}
+            for s in stages
+        }
+
+    def run(self, force=False, only=None, jobs=None):
+        """
+        Run every stage that's out of date, or every stage with force, or just
+        the named ones with only (also settable as --force / --only / --jobs).
+
+        Stages are run in waves: all stages whose inputs aren't produced by a
+        stage still to run go together, in parallel processes via schedule.run,
+        so independent figures render at the same time. A stage with a missing
+        input is skipped, along with the stages that depend on it, and the rest
+        still run; the skipped ones are reported as an error at the end.
+        """
+        args = self._parse_args()
+        force = force or args.force
+        only = only or args.only
+        jobs = jobs or args.jobs
+
+        os.chdir(self.dir)
+        pending = [s for s in self.stages if not only or s.name in only]
+        depends_on = self._dependencies(pending)
+        skipped = {}
+        while pending:
+            wave = [s for s in pending if not depends_on[s] & set(pending)]
+            pending = [s for s in pending if s not in wave]
+
+            todo = {}
+            for stage in wave:
+                blocked = [s.name for s in depends_on[stage] if s in skipped]
+                if blocked:
+                    skipped[stage] = f"needs skipped stage {', '.join(blocked)}"
+                    print(f"[{self.name}] {stage.name}: skipped, {skipped[stage]}")
+                    continue
+                # Preview renders go to different files, so keep separate stamps
+                # for any stage whose outputs move in preview mode
+                stage_outputs = [render.output_path(p) for p in stage.outputs]
+                variant = ".preview" if stage_outputs != stage.outputs else ""
+                try:
+                    key = stage.key(variant)
+                except MissingInput as e:
+                    skipped[stage] = str(e)
+                    print(f"[{self.name}] {stage.name}: skipped, {e}")
+                    continue
+                stamp = self._stamp(stage, variant)
+                up_to_date = (
+                    stamp.exists()
+                    and json.loads(stamp.read_text()).get("key") == key
+                    and all(p.exists() for p in stage_outputs)
+                )
+                if up_to_date and not force and not stage.always:
+                    print(f"[{self.name}] {stage.name}: up to date")
+                else:
+                    todo[stage] = (key, stamp, stage_outputs)
+
+            timings = schedule.run(
+                {s.name: (s.func, ()) for s in todo if not s.parallel}, jobs
+            )
+            # Workers are limited to one process each, so stages that fan out
+            # themselves run here afterwards, one at a time
+            for stage in todo:
+                if stage.parallel:
+                    timings.update(schedule.run({stage.name: (stage.func, ())}, 1))
+            for stage, (key, stamp, stage_outputs) in todo.items():
+                missing = [str(p) for p in stage_outputs if not p.exists()]
+                if missing:
+                    raise RuntimeError(f"stage {stage.name} didn't write {missing}")
+                print(f"[{self.name}] {stage.name}: {timings[stage.name]:.1f}s")
+
+                stamp.parent.mkdir(parents=True, exist_ok=True)
+                stamp.write_text(json.dumps({"key": key, "ran_at": time.time()}))
+
+        if skipped:
+            raise SystemExit(
+                f"[{self.name}] skipped: "
+                + "; ".join(f"{s.name} ({why})" for s, why in skipped.items())
+            )
+
+    def _parse_args(self):
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--force", action="store_true", help="rerun every stage")
+        parser.add_argument("--only", nargs="+", help="run just these stages")
+        parser.add_argument("--jobs", "-j", type=int, help="parallel stages")
+        parser.add_argument("--preview", action="store_true", help="draft renders")
+        return parser.parse_known_args()[0]
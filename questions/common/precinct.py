@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+# NYC election districts are identified by assembly district (AD) and election
+# district within it (ED). The city's shapefiles pack the pair into one number,
+# ElectDist = AD * 1000 + ED (e.g. AD 65, ED 1 -> 65001), which we use as the
+# join key everywhere rather than building "ED/AD" strings row by row.
+
+ED_BASE = 1000
+DTYPE = np.int32
+
+
+def _wrap(values, like):
+    if isinstance(like, pd.Series):
+        return pd.Series(values, index=like.index)
+    return values
+
+
+def encode(ad, ed):
+    """Pack AD and ED numbers (scalars, arrays or Series) into ElectDist keys."""
+    ad_values = np.asarray(ad).astype(DTYPE)
+    ed_values = np.asarray(ed).astype(DTYPE)
+    if (ed_values < 0).any() or (ed_values >= ED_BASE).any():
+        raise ValueError(f"ED numbers must be between 0 and {ED_BASE - 1}")
+    return _wrap(ad_values * ED_BASE + ed_values, ad)
+
+
+def decode(key):
+    """Split ElectDist keys back into (AD, ED)."""
+    values = np.asarray(key).astype(DTYPE)
+    return _wrap(values // ED_BASE, key), _wrap(values % ED_BASE, key)
+
+
+def parse_electdist(electdist):
+    """ElectDist values as read from a shapefile (ints or strings) to keys."""
+    values = pd.to_numeric(pd.Series(electdist), errors="raise").to_numpy()
+    return _wrap(values.astype(DTYPE), electdist)
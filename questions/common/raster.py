@@ -0,0 +1,278 @@
+import os
+import sys
+import time
+
+import numpy as np
+import shapely
+from matplotlib import cm
+from matplotlib.artist import Artist
+from matplotlib import pyplot as plt
+from matplotlib.colors import Normalize, to_rgba, to_rgba_array
+
+# Choropleths are drawn as a single image by default. Set SE_MAP_BACKEND=vector
+# to go back to GeoDataFrame.plot, with a path per polygon.
+BACKEND = os.environ.get("SE_MAP_BACKEND", "raster")
+
+# Spans are filled this many pixels at a time, to bound memory on big renders
+BATCH = 1 << 22
+
+
+def _edges(geometries):
+    # Every ring edge as (x0, y0, x1, y1) plus the index of its feature
+    parts, feature = shapely.get_parts(geometries, return_index=True)
+    rings, part = shapely.get_rings(parts, return_index=True)
+    coords, ring = shapely.get_coordinates(rings, return_index=True)
+    same_ring = ring[:-1] == ring[1:]
+    start, end = coords[:-1][same_ring], coords[1:][same_ring]
+    return start, end, feature[part[ring[:-1][same_ring]]]
+
+
+def rasterize(geometries, extent, shape):
+    """
+    Scan-convert polygons into an array of shape (height, width) holding the
+    index of the polygon covering each pixel, or -1.
+
+    extent is (xmin, xmax, ymin, ymax) in the geometries' coordinates. A pixel
+    is inside a polygon if its centre is, by the even-odd rule, so holes
+    come out right; later polygons are painted over earlier ones.
+    """
+    xmin, xmax, ymin, ymax = extent
+    height, width = shape
+    start, end, feature = _edges(np.asarray(geometries))
+
+    # To pixel coordinates, with rows counting down from the top
+    sx, sy = width / (xmax - xmin), height / (ymax - ymin)
+    x0, x1 = (start[:, 0] - xmin) * sx, (end[:, 0] - xmin) * sx
+    y0, y1 = (ymax - start[:, 1]) * sy, (ymax - end[:, 1]) * sy
+
+    # The rows whose centres (r + 0.5) each edge crosses, half-open so a vertex
+    # on a centre line is only counted once
+    first = np.clip(np.ceil(np.minimum(y0, y1) - 0.5), 0, height).astype(np.int64)
+    last = np.clip(np.ceil(np.maximum(y0, y1) - 0.5), 0, height).astype(np.int64)
+    n = last - first
+    edge = np.repeat(np.arange(len(n)), n)
+    row = first[edge] + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    centre = row + 0.5
+    x = x0[edge] + (centre - y0[edge]) * (x1[edge] - x0[edge]) / (
+        y1[edge] - y0[edge]
+    )
+    feature = feature[edge]
+
+    # Crossings pair up within each feature's row: fill from each odd one to
+    # the next
+    order = np.lexsort((x, row, feature))
+    x, row, feature = x[order], row[order], feature[order]
+    left = np.clip(np.ceil(x[0::2] - 0.5), 0, width).astype(np.int64)
+    right = np.clip(np.ceil(x[1::2] - 0.5), 0, width).astype(np.int64)
+    row, feature = row[0::2], feature[0::2]
+
+    ids = np.full(height * width, -1, dtype=np.int32)
+    length = np.maximum(right - left, 0)
+    batch = np.cumsum(length) // BATCH
+    for b in np.unique(batch):
+        spans = batch == b
+        n = length[spans]
+        offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        pixels = np.repeat(row[spans] * width + left[spans], n) + offset
+        ids[pixels] = np.repeat(feature[spans], n)
+    return ids.reshape(shape)
+
+
+def outline(ids, width=1):
+    """Pixels on a boundary between two polygons, or a polygon and nothing."""
+    edge = np.zeros(ids.shape, dtype=bool)
+    edge[:, :-1] |= ids[:, :-1] != ids[:, 1:]
+    edge[:-1, :] |= ids[:-1, :] != ids[1:, :]
+    for _ in range(width - 1):
+        edge[:, 1:] |= edge[:, :-1].copy()
+        edge[1:, :] |= edge[:-1, :].copy()
+    return edge
+
+
+def _extent(ax, gdf):
+    # Limits and aspect as GeoDataFrame.plot would set them
+    xmin, ymin, xmax, ymax = gdf.total_bounds
+    ax.update_datalim([(xmin, ymin), (xmax, ymax)])
+    ax.autoscale_view()
+    if gdf.crs is not None and gdf.crs.is_geographic:
+        ax.set_aspect(1 / np.cos(np.radians((ymin + ymax) / 2)))
+    else:
+        ax.set_aspect("equal")
+
+
+def feature_colours(gdf, facecolor, column, cmap, vmin, vmax, missing):
+    """
+    RGBA per feature, and a colourbar mappable for column plots. Missing values
+    are left transparent if there's no missing colour, as gdf.plot leaves them
+    out.
+    """
+    if column is None:
+        colours = to_rgba_array(
+            facecolor if facecolor is not None else plt.rcParams["patch.facecolor"]
+        )
+        if len(colours) == 1:
+            colours = np.repeat(colours, len(gdf), axis=0)
+        return colours, None
+    values = gdf[column].to_numpy(dtype=float)
+    norm = Normalize(
+        np.nanmin(values) if vmin is None else vmin,
+        np.nanmax(values) if vmax is None else vmax,
+    )
+    cmap = plt.get_cmap(cmap)
+    colours = cmap(norm(values))
+    colours[np.isnan(values)] = to_rgba(missing) if missing else (0, 0, 0, 0)
+    return colours, cm.ScalarMappable(norm=norm, cmap=cmap)
+
+
+class Choropleth(Artist):
+    """
+    Polygons drawn as one image, scan-converted when the figure is drawn so
+    there's exactly one image pixel per output pixel, whatever the dpi and
+    wherever layout (colourbars, tight bboxes) has put the axes.
+    """
+
+    def __init__(self, geometries, colours, edgecolor, linewidth):
+        super().__init__()
+        self.geometries = geometries
+        # uint8 palette with an extra transparent entry for "no polygon"
+        palette = np.vstack([colours, [0, 0, 0, 0]])
+        self.palette = (palette * 255).round().astype(np.uint8)
+        self.edgecolor = (np.array(to_rgba(edgecolor)) * 255).round().astype(np.uint8)
+        self.linewidth = linewidth
+        self._cached = (None, None)
+
+    def make_image(self, renderer):
+        bbox = self.axes.bbox
+        shape = (max(1, round(bbox.height)), max(1, round(bbox.width)))
+        extent = (*self.axes.get_xlim(), *self.axes.get_ylim())
+        key = (shape, extent, renderer.dpi)
+        if self._cached[0] != key:
+            ids = rasterize(self.geometries, extent, shape)
+            # Gathering whole RGBA pixels as uint32 is several times faster
+            # than gathering rows of the (n, 4) palette
+            image = self.palette.view(np.uint32)[:, 0][ids].view(np.uint8)
+            image = image.reshape(*shape, 4)
+            if self.linewidth:
+                # Lines thinner than a pixel are blended in, as antialiasing would
+                pixels = self.linewidth / 72 * renderer.dpi
+                edge = outline(ids, max(1, round(pixels)))
+                alpha = min(1.0, pixels)
+                image[edge] = (
+                    alpha * self.edgecolor + (1 - alpha) * image[edge]
+                ).round()
+            self._cached = (key, image)
+        return self._cached[1]
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        image = self.make_image(renderer)
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(self.axes.bbox)
+        bbox = self.axes.bbox
+        renderer.draw_image(gc, round(bbox.x0), round(bbox.y0), image[::-1])
+        gc.restore()
+
+
+def plot(
+    gdf,
+    ax,
+    facecolor=None,
+    column=None,
+    cmap=None,
+    vmin=None,
+    vmax=None,
+    legend=False,
+    legend_kwds=None,
+    missing_kwds=None,
+    edgecolor="black",
+    linewidth=1.0,
+    **kwargs,
+):
+    """
+    Draw a choropleth of gdf on ax, like gdf.plot with the same arguments, but
+    as one image scan-converted with numpy rather than one path per polygon.
+
+    Limits, aspect and colourbar are set as GeoDataFrame.plot sets them, so
+    titles, labels and legends line up exactly as before.
+    """
+    missing = None if missing_kwds is None else missing_kwds.get("color", "lightgrey")
+    if BACKEND == "vector":
+        options = dict(
+            facecolor=facecolor,
+            column=column,
+            cmap=cmap,
+            vmin=vmin,
+            vmax=vmax,
+            legend_kwds=legend_kwds,
+            missing_kwds=missing_kwds,
+        )
+        options = {k: v for k, v in options.items() if v is not None}
+        return gdf.plot(
+            ax=ax,
+            legend=legend,
+            edgecolor=edgecolor,
+            linewidth=linewidth,
+            **options,
+            **kwargs,
+        )
+
+    _extent(ax, gdf)
+    colours, mappable = feature_colours(
+        gdf, facecolor, column, cmap, vmin, vmax, missing
+    )
+    geometries = np.asarray(gdf.geometry.values, dtype=object).copy()
+    geometries[colours[:, 3] == 0] = None
+
+    artist = Choropleth(geometries, colours, edgecolor, linewidth)
+    artist.set_zorder(1)
+    ax.add_artist(artist)
+    if legend and mappable is not None:
+        ax.figure.colorbar(mappable, ax=ax, **(legend_kwds or {}))
+    return ax
+
+
+# ----- Benchmark: python -m common.raster [shapefile] -----
+
+
+def _draw_vector(gdf, ax, dpi):
+    gdf.plot(facecolor=gdf["colour"], ax=ax, edgecolor="black", linewidth=0.1)
+
+
+def _draw_raster(gdf, ax, dpi):
+    plot(gdf, ax, facecolor=gdf["colour"], edgecolor="black", linewidth=0.1)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    import geopandas as gpd
+    from PIL import Image
+
+    from . import basemap
+
+    if len(sys.argv) > 1:
+        gdf = gpd.read_file(sys.argv[1])
+    else:
+        gdf = basemap.us_counties()
+    gdf["colour"] = np.random.default_rng(0).choice(["r", "b"], len(gdf))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dpi in (100, 800):
+            for name, draw in (("vector", _draw_vector), ("raster", _draw_raster)):
+                start = time.perf_counter()
+                fig, ax = plt.subplots(1, dpi=dpi)
+                draw(gdf, ax, dpi)
+                ax.axis("off")
+                fig.canvas.draw()
+                t_draw = time.perf_counter() - start
+                # Encoding the PNG costs the same whichever way it was drawn
+                start = time.perf_counter()
+                pixels = np.asarray(fig.canvas.buffer_rgba())
+                Image.fromarray(pixels).save(f"{tmp}/map.png")
+                t_png = time.perf_counter() - start
+                plt.close(fig)
+                print(
+                    f"{len(gdf)} polygons at {dpi} dpi, {name}: "
+                    f"draw {t_draw:.2f}s, png {t_png:.2f}s"
+                )
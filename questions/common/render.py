@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from matplotlib import pyplot as plt
+
+# Run any script with --preview (or SE_PREVIEW=1) for a quick low-resolution
+# draft. Figures are then rendered at PREVIEW_DPI from coarsely simplified
+# geometry and written next to the real output as <name>.preview.png.
+PREVIEW = "--preview" in sys.argv or os.environ.get("SE_PREVIEW", "") not in ("", "0")
+PREVIEW_DPI = 100
+
+# If set, every savefig appends a line of json with its timing to this file
+# (used by build.py for its report).
+TIMINGS = os.environ.get("SE_TIMINGS")
+
+
+def dpi(n):
+    """The DPI to actually render at when n was asked for."""
+    return min(n, PREVIEW_DPI) if PREVIEW else n
+
+
+def pixels(n, figsize=None):
+    """Width in pixels of a figure of figsize (default: matplotlib's) at n DPI."""
+    width = (figsize or plt.rcParams["figure.figsize"])[0]
+    return int(width * dpi(n))
+
+
+def output_path(fname):
+    """Where an output actually gets written - images move aside in preview mode."""
+    path = Path(fname)
+    if PREVIEW and path.suffix == ".png":
+        return path.with_suffix(".preview.png")
+    return path
+
+
+def savefig(fname, dpi=None, **kwargs):
+    """plt.savefig, but honouring preview mode."""
+    fname = output_path(fname)
+    if PREVIEW:
+        kwargs["dpi"] = min(dpi or plt.gcf().dpi, PREVIEW_DPI)
+    elif dpi is not None:
+        kwargs["dpi"] = dpi
+    start = time.perf_counter()
+    plt.savefig(fname, **kwargs)
+    if TIMINGS:
+        record = {
+            "question": Path.cwd().name,
+            "figure": str(fname),
+            "seconds": time.perf_counter() - start,
+        }
+        with open(TIMINGS, "a") as f:
+            f.write(json.dumps(record) + "\n")
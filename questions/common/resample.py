@@ -0,0 +1,140 @@
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from . import schedule, stats
+
+Interval = namedtuple("Interval", ["estimate", "low", "high"])
+
+Bootstrap = namedtuple("Bootstrap", ["r", "slope"])
+
+# Resamples drawn and evaluated together, and the unit of work per process
+BATCH = 500
+
+
+def _complete(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if valid.sum() < 3:
+        raise ValueError("need at least 3 complete rows")
+    # Centre on the full-sample means so the sums below don't lose precision
+    x, y = x[valid], y[valid]
+    return x - x.mean(), y - y.mean()
+
+
+def _fit(n, sx, sy, sxx, syy, sxy):
+    # Slope and r of every resample from its sums, as arrays
+    cxx = sxx - sx * sx / n
+    cyy = syy - sy * sy / n
+    cxy = sxy - sx * sy / n
+    return cxy / np.sqrt(cxx * cyy), cxy / cxx
+
+
+def _bootstrap_batch(x, y, size, seed):
+    n = len(x)
+    rng = np.random.default_rng(seed)
+    # Every resample's row indexes as one array, turned into how many times
+    # each row was drawn, so all the sums are one matrix product
+    rows = rng.integers(0, n, size=(size, n)) + n * np.arange(size)[:, None]
+    counts = np.bincount(rows.ravel(), minlength=size * n).reshape(size, n)
+    sums = counts.astype(float) @ np.column_stack([x, y, x * x, y * y, x * y])
+    return _fit(n, *sums.T)
+
+
+def _permutation_batch(x, y, size, seed):
+    rng = np.random.default_rng(seed)
+    # Shuffling y leaves every sum but sum(xy) unchanged
+    shuffled = rng.permuted(np.broadcast_to(y, (size, len(y))), axis=1)
+    return _fit(len(x), x.sum(), y.sum(), x @ x, y @ y, shuffled @ x)[0]
+
+
+def _batches(function, x, y, resamples, seed, jobs):
+    # Fixed-size batches with their own seeds, so results don't depend on jobs
+    sizes = [min(BATCH, resamples - i) for i in range(0, resamples, BATCH)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return schedule.starmap(
+        function, [(x, y, size, s) for size, s in zip(sizes, seeds)], jobs
+    )
+
+
+def bootstrap(x, y, resamples=10000, level=0.95, seed=0, jobs=None):
+    """
+    Percentile bootstrap intervals for Pearson's r and the least-squares slope
+    of y on x, as a Bootstrap of Intervals (estimate, low, high).
+
+    Rows where x or y is missing are left out. Resamples are evaluated in
+    batches, each as one matrix product, spread over jobs processes (default:
+    one per core); the same seed gives the same intervals whatever jobs is.
+    """
+    x, y = _complete(x, y)
+    results = _batches(_bootstrap_batch, x, y, resamples, seed, jobs)
+    r = np.concatenate([r for r, _ in results])
+    slope = np.concatenate([slope for _, slope in results])
+
+    fit = stats.linregress(x, y)
+    tails = [(1 - level) / 2 * 100, (1 + level) / 2 * 100]
+    return Bootstrap(
+        Interval(float(fit.r), *np.nanpercentile(r, tails).tolist()),
+        Interval(float(fit.slope), *np.nanpercentile(slope, tails).tolist()),
+    )
+
+
+def permutation(x, y, resamples=10000, seed=0, jobs=None):
+    """
+    Two-sided permutation p-value for r (and so for the slope) being non-zero:
+    the share of random pairings of x and y with |r| at least as large as
+    observed, counting the observed pairing.
+    """
+    x, y = _complete(x, y)
+    r = np.concatenate(_batches(_permutation_batch, x, y, resamples, seed, jobs))
+    observed = abs(stats.linregress(x, y).r)
+    return float((1 + (np.abs(r) >= observed).sum()) / (1 + resamples))
+
+
+# ----- Benchmark: python -m common.resample [resamples] [rows] -----
+
+
+def _bootstrap_loop(x, y, resamples, seed=0):
+    # One linregress per resample
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    r, slope = np.empty(resamples), np.empty(resamples)
+    for i in range(resamples):
+        rows = rng.integers(0, n, n)
+        fit = stats.linregress(x[rows], y[rows])
+        r[i], slope[i] = fit.r, fit.slope
+    return r, slope
+
+
+if __name__ == "__main__":
+    resamples = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 3100
+    rng = np.random.default_rng(0)
+    x = rng.normal(30, 10, n)
+    y = -0.3 * x + rng.normal(0, 5, n)
+
+    loop = min(resamples, 1000)
+    start = time.perf_counter()
+    r, slope = _bootstrap_loop(x, y, loop)
+    t_loop = (time.perf_counter() - start) * resamples / loop
+    print(
+        f"loop: r {np.percentile(r, [2.5, 97.5]).round(3)}, "
+        f"~{t_loop:.2f}s for {resamples} (timed {loop})"
+    )
+
+    for jobs in sorted({1, schedule.default_jobs()}):
+        start = time.perf_counter()
+        result = bootstrap(x, y, resamples, jobs=jobs)
+        t_boot = time.perf_counter() - start
+        start = time.perf_counter()
+        p = permutation(x, y, resamples, jobs=jobs)
+        t_perm = time.perf_counter() - start
+        print(
+            f"{resamples} resamples x {n} rows, {jobs} jobs: "
+            f"r {result.r.low:.3f} to {result.r.high:.3f}, "
+            f"bootstrap {t_boot:.2f}s ({t_loop / t_boot:.0f}x), "
+            f"permutation p={p:.4f} {t_perm:.2f}s"
+        )
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_jobs():
+    """Worker processes to use - SE_JOBS if set, else one per core."""
+    return int(os.environ.get("SE_JOBS", 0)) or os.cpu_count() or 1
+
+
+def _setup():
+    from matplotlib import pyplot as plt
+
+    plt.switch_backend("Agg")
+    # Work a task splits up itself (e.g. resample.bootstrap) stays in the
+    # worker, rather than each of them starting a pool of its own
+    os.environ["SE_JOBS"] = "1"
+
+
+def _timed(func, args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(tasks, jobs=None):
+    """
+    Run independent tasks, given as {name: (func, args)}, in a process pool.
+
+    Meant for figures that don't depend on each other: each task draws and saves
+    its own figure on the Agg backend. Workers are forked, so tasks can be
+    functions defined in the calling script and can see its globals. Where
+    fork isn't available, or there's only one task or one job, they run in
+    this process one after another. Returns {name: seconds taken}.
+    """
+    jobs = min(jobs or default_jobs(), len(tasks))
+    if jobs <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return {name: _timed(func, args) for name, (func, args) in tasks.items()}
+
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=_setup) as pool:
+        futures = {
+            name: pool.submit(_timed, func, args) for name, (func, args) in tasks.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def starmap(func, args, jobs=None):
+    """
+    func(*a) for each a in args, spread over a process pool like run(), with
+    the results returned in order. For splitting one computation into chunks
+    rather than running separate figures.
+    """
+    args = list(args)
+    jobs = min(jobs or default_jobs(), len(args))
+    if jobs <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return [func(*a) for a in args]
+
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=_setup) as pool:
+        return [future.result() for future in [pool.submit(func, *a) for a in args]]
@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def _grid(df, years):
+    # Columns may be labelled "1864" or 1864
+    df = df.rename(columns=lambda c: int(c) if str(c).isdigit() else c)
+    return df.reindex(columns=years)
+
+
+def split_matrix(pres, house, years, lag=2):
+    """
+    Which units split their results, as a units x years boolean frame.
+
+    pres and house are winners (party labels) with one row per unit - state,
+    county or district - and one column per election year. A unit splits in
+    year y if its presidential winner differs from the House winner at the
+    election lag years earlier; units with no House result then don't count.
+    Everything is compared in one go on aligned arrays.
+    """
+    years = list(years)
+    p = _grid(pres, years).to_numpy(dtype=object)
+    h = _grid(house, [y - lag for y in years]).reindex(pres.index)
+    h = h.to_numpy(dtype=object)
+    split = (p != h) & pd.notna(h)
+    return pd.DataFrame(split, index=pres.index, columns=years)
+
+
+def counts(splits):
+    """Number of splits per unit, leaving out units that never split."""
+    n = splits.sum(axis=1)
+    return n[n > 0]
+
+
+def by_year(splits):
+    """{year: sorted list of units that split that year}."""
+    units = splits.index.to_numpy()
+    return {y: sorted(units[splits[y].to_numpy()]) for y in splits.columns}
+
+
+# ----- Benchmark: python -m common.splits -----
+
+
+def _by_year_loop(pres, house, years, lag=2):
+    # The per-year dict comparison 53180 used to run
+    diff = {}
+    for y in years:
+        p = pres[y].to_dict()
+        h = house[y - lag].to_dict()
+        diff[y] = sorted(k for k in p if p[k] != h[k] and not pd.isnull(h[k]))
+    return diff
+
+
+def _synthetic(n, years, seed=0):
+    rng = np.random.default_rng(seed)
+    index = [f"{i:05d}" for i in range(n)]
+
+    def grid(columns):
+        values = rng.choice(np.array(["D", "R", None], dtype=object), (n, len(columns)))
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    return grid(years), grid([y - 2 for y in years])
+
+
+if __name__ == "__main__":
+    years = list(range(1864, 2024, 4))
+    for name, n in (("states", 50), ("districts", 435), ("counties", 3100)):
+        pres, house = _synthetic(n, years)
+
+        start = time.perf_counter()
+        old = _by_year_loop(pres, house, years)
+        t_old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = by_year(split_matrix(pres, house, years))
+        t_new = time.perf_counter() - start
+
+        assert old == new
+        print(
+            f"{name} ({n} x {len(years)}): loop {t_old:.3f}s, "
+            f"vectorized {t_new:.3f}s ({t_old / t_new:.0f}x)"
+        )
@@ -0,0 +1,61 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Fit = namedtuple("Fit", ["slope", "intercept", "r", "leverage", "studentized"])
+
+
+def linregress(x, y):
+    """
+    Least-squares fit of each column of y on x, in closed form.
+
+    y can be a single series or several columns (a 2D array or DataFrame) which
+    are all fitted against the same x in one pass. Returns a Fit holding, per
+    column, the slope, intercept and Pearson's r, plus the leverage of each point
+    and the internally studentized residuals. Rows where x or any y is missing
+    are left out of the fit and get NaN leverage and residuals.
+    """
+    columns = y.columns if isinstance(y, pd.DataFrame) else None
+    index = x.index if isinstance(x, pd.Series) else None
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    vector = y.ndim == 1
+    if vector:
+        y = y[:, None]
+
+    valid = np.isfinite(x) & np.isfinite(y).all(axis=1)
+    xv, yv = x[valid], y[valid]
+    n = len(xv)
+    if n < 3:
+        raise ValueError("need at least 3 complete rows to fit a line")
+
+    xc = xv - xv.mean()
+    yc = yv - yv.mean(axis=0)
+    sxx = xc @ xc
+    sxy = xc @ yc
+    syy = (yc * yc).sum(axis=0)
+
+    slope = sxy / sxx
+    intercept = yv.mean(axis=0) - slope * xv.mean()
+    r = sxy / np.sqrt(sxx * syy)
+
+    residuals = yc - np.outer(xc, slope)
+    h = xc * xc / sxx + 1 / n
+    s = np.sqrt((residuals * residuals).sum(axis=0) / (n - 2))
+    studentized = np.full(y.shape, np.nan)
+    studentized[valid] = residuals / np.outer(np.sqrt(1 - h), s)
+    leverage = np.full(len(x), np.nan)
+    leverage[valid] = h
+
+    if vector:
+        return Fit(slope[0], intercept[0], r[0], leverage, studentized[:, 0])
+    if columns is not None:
+        return Fit(
+            pd.Series(slope, index=columns),
+            pd.Series(intercept, index=columns),
+            pd.Series(r, index=columns),
+            leverage,
+            pd.DataFrame(studentized, index=index, columns=columns),
+        )
+    return Fit(slope, intercept, r, leverage, studentized)
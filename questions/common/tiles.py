@@ -0,0 +1,195 @@
+"""
+Choropleths exported as a z/x/y pyramid of 256px web-mercator tiles.
+
+    python main.py --tiles        # or SE_TILES=1
+    python -m common.live .cache/tiles/66090/precinct_map   # then open /index.html
+
+Tiles are rasterized with common/raster.py, a batch per worker process, and
+only when the map's geometry, colours or style change.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import sys
+
+import numpy as np
+import shapely
+from matplotlib import pyplot as plt
+from matplotlib.colors import to_rgba
+
+from . import raster, schedule
+from .fetch import CACHE_DIR
+
+REQUESTED = "--tiles" in sys.argv or os.environ.get("SE_TILES", "") not in ("", "0")
+
+TILE = 256
+
+# Half the width of the web-mercator world, in metres
+HALF = 20037508.342789244
+
+VIEWER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map("map");
+L.tileLayer("https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+  attribution: "&copy; OpenStreetMap contributors", opacity: 0.4
+}}).addTo(map);
+L.tileLayer("{{z}}/{{x}}/{{y}}.png", {{minZoom: {min_zoom}, maxZoom: {max_zoom}}}).addTo(map);
+map.fitBounds([[{south}, {west}], [{north}, {east}]]);
+</script>
+</body>
+</html>
+"""
+
+# What the worker processes render from, set before they're forked
+_job = None
+
+
+def _tile_size(z):
+    return 2 * HALF / 2**z
+
+
+def _tile_extent(z, x, y):
+    size = _tile_size(z)
+    xmin, ymax = -HALF + x * size, HALF - y * size
+    return xmin, xmin + size, ymax - size, ymax
+
+
+def _tile_range(bounds, z):
+    xmin, ymin, xmax, ymax = bounds
+    size = _tile_size(z)
+    last = 2**z - 1
+    x0, x1 = (int((v + HALF) // size) for v in (xmin, xmax))
+    y0, y1 = (int((HALF - v) // size) for v in (ymax, ymin))
+    return range(max(x0, 0), min(x1, last) + 1), range(max(y0, 0), min(y1, last) + 1)
+
+
+def _render(tiles):
+    geometries, tree, palette, edgecolor, linewidth, out = _job
+    for z, x, y in tiles:
+        xmin, xmax, ymin, ymax = _tile_extent(z, x, y)
+        # Render a pixel beyond each side, so boundaries on the tile edge show
+        pad = (xmax - xmin) / TILE
+        extent = (xmin - pad, xmax + pad, ymin - pad, ymax + pad)
+        area = shapely.box(extent[0], extent[2], extent[1], extent[3])
+        features = np.sort(tree.query(area))
+        if not len(features):
+            continue
+
+        ids = raster.rasterize(geometries[features], extent, (TILE + 2, TILE + 2))
+        image = palette[np.where(ids >= 0, features[ids], -1)]
+        if linewidth:
+            edge = raster.outline(ids, max(1, round(linewidth)))
+            alpha = min(1.0, linewidth)
+            image[edge] = (alpha * edgecolor + (1 - alpha) * image[edge]).round()
+
+        path = out / str(z) / str(x) / f"{y}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        plt.imsave(path, image[1:-1, 1:-1])
+
+
+def directory(name, question):
+    """Where export(gdf, name, question) writes its tiles."""
+    return CACHE_DIR / "tiles" / question / name
+
+
+def _version(geometries, palette, *params):
+    h = hashlib.sha256(b"".join(shapely.to_wkb(geometries)))
+    h.update(palette.tobytes())
+    h.update(repr(params).encode())
+    return h.hexdigest()
+
+
+def export(
+    gdf,
+    name,
+    question,
+    facecolor=None,
+    column=None,
+    cmap=None,
+    vmin=None,
+    vmax=None,
+    missing_kwds=None,
+    edgecolor="black",
+    linewidth=0.5,
+    max_zoom=16,
+    jobs=None,
+):
+    """
+    Render gdf as tiles under .cache/tiles/<question>/<name>, where question
+    is the script's folder name (e.g. pipeline.name), styled with the
+    same arguments as raster.plot (linewidth here is in tile pixels), and
+    return the directory, which also gets an index.html viewer.
+
+    Zoom levels run from the first at which the whole map fits on one tile up
+    to max_zoom. Tiles are spread over jobs processes (default: one per core),
+    and if the map hasn't changed since the last export nothing is redrawn.
+    From a pipeline, declare the stage parallel=True, since stages running in
+    schedule workers are held to one process.
+    """
+    global _job
+
+    out = directory(name, question)
+    gdf = gdf[gdf.geometry.notna()].to_crs(epsg=3857)
+    missing = None if missing_kwds is None else missing_kwds.get("color", "lightgrey")
+    colours, _ = raster.feature_colours(
+        gdf, facecolor, column, cmap, vmin, vmax, missing
+    )
+    palette = (np.vstack([colours, [0, 0, 0, 0]]) * 255).round().astype(np.uint8)
+    geometries = np.asarray(gdf.geometry.values, dtype=object)
+
+    bounds = gdf.total_bounds
+    span = max(bounds[2] - bounds[0], bounds[3] - bounds[1])
+    min_zoom = max(0, min(max_zoom, int(math.log2(2 * HALF / span))))
+    version = _version(geometries, palette, edgecolor, linewidth, min_zoom, max_zoom)
+
+    stamp = out / "version.json"
+    if stamp.exists() and json.loads(stamp.read_text()).get("version") == version:
+        return out
+
+    tmp = out.with_name(out.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    edge = (np.array(to_rgba(edgecolor)) * 255).round()
+    _job = (geometries, shapely.STRtree(geometries), palette, edge, linewidth, tmp)
+    tiles = [
+        (z, x, y)
+        for z in range(min_zoom, max_zoom + 1)
+        for xs, ys in [_tile_range(bounds, z)]
+        for x in xs
+        for y in ys
+    ]
+    jobs = jobs or schedule.default_jobs()
+    batches = [tiles[i :: jobs * 4] for i in range(min(len(tiles), jobs * 4))]
+    schedule.run({i: (_render, (batch,)) for i, batch in enumerate(batches)}, jobs)
+    _job = None
+
+    west, south, east, north = gdf.to_crs(epsg=4326).total_bounds
+    (tmp / "index.html").write_text(
+        VIEWER.format(
+            title=name,
+            min_zoom=min_zoom,
+            max_zoom=max_zoom,
+            west=west,
+            south=south,
+            east=east,
+            north=north,
+        )
+    )
+    (tmp / "version.json").write_text(json.dumps({"version": version}))
+    shutil.rmtree(out, ignore_errors=True)
+    tmp.rename(out)
+    print(f"{len(tiles)} tiles for {name} in {out}")
+    return out